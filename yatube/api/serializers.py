@@ -0,0 +1,46 @@
+import json
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'comments_count',
+    'author__username', 'group__slug',
+)
+COMMENT_FIELDS = ('id', 'text', 'pub_date', 'author__username')
+
+
+def post_values(queryset, prefix='', *extra):
+    return queryset.values(
+        *extra, *(prefix + field for field in POST_FIELDS)
+    )
+
+
+def serialize_post(row, prefix=''):
+    image = row[prefix + 'image']
+    return {
+        'id': row[prefix + 'id'],
+        'text': row[prefix + 'text'],
+        'pub_date': row[prefix + 'pub_date'],
+        'author': row[prefix + 'author__username'],
+        'group': row[prefix + 'group__slug'],
+        'image': default_storage.url(image) if image else None,
+        'comments_count': row[prefix + 'comments_count'],
+    }
+
+
+def comment_values(queryset):
+    return queryset.values(*COMMENT_FIELDS)
+
+
+def serialize_comment(row):
+    return {
+        'id': row['id'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': row['author__username'],
+    }
+
+
+def dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
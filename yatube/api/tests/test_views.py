@@ -0,0 +1,115 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiViewsTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}',
+                                group=self.group)
+            for i in range(5)
+        ]
+        self.posts.reverse()
+        cache.clear()
+
+    def collect(self, client, url):
+        """Проходит ленту по курсорам и возвращает id всех постов."""
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            response = client.get(url, {'cursor': cursor, 'limit': 2})
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            data = response.json()
+            ids += [post['id'] for post in data['results']]
+            cursor = data['next_cursor']
+        return ids
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Ленты API отдают все посты по курсорам без повторов."""
+        expected = [post.id for post in self.posts]
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': self.author}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.collect(self.reader_client, url),
+                                 expected)
+
+    def test_post_fields(self):
+        """Пост сериализуется со всеми полями."""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader,
+                               text='Комментарий')
+        response = self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': post.id})
+        )
+        data = response.json()
+        self.assertEqual(data['post']['text'], post.text)
+        self.assertEqual(data['post']['author'], self.author.username)
+        self.assertEqual(data['post']['group'], self.group.slug)
+        self.assertEqual(data['post']['comments_count'], 1)
+        self.assertIsNone(data['post']['image'])
+        self.assertEqual(
+            [comment['author'] for comment in data['comments']['results']],
+            [self.reader.username],
+        )
+
+    def test_feed_query_count_does_not_grow(self):
+        """Страница ленты строится одним запросом к постам."""
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('api:index'))
+
+    def test_errors(self):
+        """Ошибки возвращаются в JSON с нужным статусом."""
+        responses = {
+            reverse('api:follow_index'): HTTPStatus.UNAUTHORIZED,
+            reverse('api:export'): HTTPStatus.UNAUTHORIZED,
+            reverse('api:post_detail', kwargs={'post_id': 999}):
+                HTTPStatus.NOT_FOUND,
+            reverse('api:group_list', kwargs={'any_slug': 'missing'}):
+                HTTPStatus.NOT_FOUND,
+        }
+        for url, status in responses.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_export_streams_all_posts(self):
+        """Выгрузка отдается потоком и содержит все посты."""
+        self.assertEqual(
+            self.reader_client.get(reverse('api:export')).status_code,
+            HTTPStatus.FORBIDDEN,
+        )
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.reader_client.force_login(staff)
+        response = self.reader_client.get(reverse('api:export'))
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(
+            [post['id'] for post in data],
+            sorted(post.id for post in self.posts),
+        )
@@ -0,0 +1,148 @@
+from functools import wraps
+
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.http import JsonResponse, StreamingHttpResponse
+
+from posts import caching
+from posts.models import Comment, Group, Post, User
+from posts.utils import KeysetPage, KeysetPaginator
+from posts.views import (
+    follow_scopes, group_scopes, index_scopes, post_scopes, profile_scopes
+)
+
+from .serializers import (
+    comment_values, dumps, post_values, serialize_comment, serialize_post
+)
+
+
+def error(detail, status):
+    return JsonResponse(
+        {'detail': detail}, status=status,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Требуется авторизация', 401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def staff_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_staff:
+            return error('Недостаточно прав', 403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def page_size(request):
+    try:
+        size = int(request.GET.get('limit', settings.POSTS_ON_PAGE))
+    except ValueError:
+        size = settings.POSTS_ON_PAGE
+    return min(max(size, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def keyset_page(request, rows, serialize, ordering=('-pub_date', '-id')):
+    paginator = KeysetPaginator(rows, page_size(request), ordering=ordering)
+    try:
+        page = paginator.get_page(request.GET.get('cursor'))
+    except InvalidPage:
+        # Битый курсор не должен возвращать клиента к первой странице
+        page = KeysetPage([], paginator, None, None)
+    return {
+        'results': [serialize(row) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def comments_page(request, post_id):
+    return keyset_page(
+        request,
+        comment_values(Comment.objects.filter(post_id=post_id)),
+        serialize_comment,
+        ordering=('pub_date', 'id'),
+    )
+
+
+def respond(data):
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
+
+
+@caching.conditional(index_scopes)
+def index(request):
+    return respond(
+        keyset_page(request, post_values(Post.objects.all()), serialize_post)
+    )
+
+
+@login_required
+@caching.conditional(follow_scopes)
+def follow_index(request):
+    entries = post_values(request.user.timeline.all(), 'post__',
+                          'id', 'pub_date')
+    return respond(keyset_page(
+        request, entries, lambda row: serialize_post(row, 'post__')
+    ))
+
+
+@caching.conditional(group_scopes)
+def group_posts(request, any_slug):
+    if not Group.objects.filter(slug=any_slug).exists():
+        return error('Группа не найдена', 404)
+    posts = post_values(Post.objects.filter(group__slug=any_slug))
+    return respond(keyset_page(request, posts, serialize_post))
+
+
+@caching.conditional(profile_scopes)
+def profile(request, username):
+    if not User.objects.filter(username=username).exists():
+        return error('Пользователь не найден', 404)
+    posts = post_values(Post.objects.filter(author__username=username))
+    return respond(keyset_page(request, posts, serialize_post))
+
+
+@caching.conditional(post_scopes)
+def post_detail(request, post_id):
+    row = post_values(Post.objects.filter(pk=post_id)).first()
+    if row is None:
+        return error('Пост не найден', 404)
+    return respond({
+        'post': serialize_post(row),
+        'comments': comments_page(request, post_id),
+    })
+
+
+@caching.conditional(post_scopes)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден', 404)
+    return respond(comments_page(request, post_id))
+
+
+def stream_posts(rows):
+    # Массив JSON собирается по строкам, в памяти только одна порция
+    yield '['
+    for number, row in enumerate(rows):
+        yield (',' if number else '') + dumps(serialize_post(row))
+    yield ']'
+
+
+@login_required
+@staff_required
+def export(request):
+    rows = post_values(Post.objects.order_by('id')).iterator(
+        chunk_size=settings.API_EXPORT_CHUNK_SIZE
+    )
+    response = StreamingHttpResponse(
+        stream_posts(rows), content_type='application/json; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'attachment; filename="posts.json"'
+    return response
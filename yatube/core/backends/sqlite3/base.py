@@ -0,0 +1,32 @@
+from django.db.backends.sqlite3 import base
+
+# Параметры OPTIONS, которые обрабатывает бэкенд, а не sqlite3.connect
+BACKEND_OPTIONS = ('pragmas', 'transaction_mode')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite с PRAGMA из OPTIONS['pragmas'] для каждого соединения.
+
+    OPTIONS['transaction_mode'] = 'IMMEDIATE' берет блокировку записи
+    в начале транзакции. Иначе транзакция, начавшая с чтения, не может
+    дождаться чужой записи и сразу падает с «database is locked».
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in BACKEND_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get(
+            'transaction_mode', 'DEFERRED'
+        )
+        self.cursor().execute(f'BEGIN {mode}')
@@ -0,0 +1,220 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+NOT_EXPIRED = '(expires IS NULL OR expires > ?)'
+MISSING = object()
+
+
+def count_read(found):
+    # get_many в BaseCache читает через get, поэтому каждый ключ
+    # считается отдельно
+    metrics.count('cache_hits' if found else 'cache_misses')
+
+
+class LocMemCache(locmem.LocMemCache):
+    """Кэш процесса, чтения которого попадают в замеры запроса."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version)
+        count_read(value is not MISSING)
+        return default if value is MISSING else value
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кэш в файле SQLite.
+
+    Целые числа хранятся как есть, поэтому incr выполняется одним
+    UPDATE, остальные значения - в pickle. При превышении MAX_ENTRIES
+    удаляются записи, к которым дольше всего не обращались; число
+    записей проверяется раз в CULL_INTERVAL записей процесса, а не
+    на каждой: COUNT(*) читает весь индекс. Время
+    обращения обновляется не чаще ACCESS_RESOLUTION секунд, чтобы
+    чтения не превращались в постоянные записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._access_resolution = options.get('ACCESS_RESOLUTION', 1)
+        self._cull_interval = options.get('CULL_INTERVAL', 100)
+        self._writes = 0
+        self._path = location
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _write(self, sql, params):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.execute(sql, params)
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return cursor.rowcount
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        row = self._db.execute(
+            'SELECT value, accessed FROM cache '
+            f'WHERE key = ? AND {NOT_EXPIRED}',
+            (key, now),
+        ).fetchone()
+        count_read(row is not None)
+        if row is None:
+            return default
+        value, accessed = row
+        if now - accessed >= self._access_resolution:
+            self._db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return self._decode(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+            (key, self._encode(value), self.get_backend_timeout(timeout),
+             time.time()),
+        )
+        self._cull()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {NOT_EXPIRED}',
+                (key, now),
+            )
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)',
+                (key, self._encode(value),
+                 self.get_backend_timeout(timeout), now),
+            ).rowcount
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        if added:
+            self._cull()
+        return bool(added)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            updated = db.execute(
+                'UPDATE cache SET value = value + ?, accessed = ? '
+                "WHERE key = ? AND typeof(value) = 'integer' "
+                f'AND {NOT_EXPIRED}',
+                (delta, now, key, now),
+            ).rowcount
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        if not updated:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self._write(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {NOT_EXPIRED}',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        ))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {NOT_EXPIRED}',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def clear(self):
+        self._write('DELETE FROM cache', ())
+
+    def _cull(self):
+        if not self._max_entries:
+            return
+        self._writes += 1
+        if self._writes % self._cull_interval:
+            return
+        db = self._db
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        self._write(
+            f'DELETE FROM cache WHERE NOT {NOT_EXPIRED}', (time.time(),)
+        )
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        excess = count - self._max_entries
+        if excess > 0:
+            excess += self._max_entries // self._cull_frequency
+            self._write(
+                'DELETE FROM cache WHERE key IN '
+                '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (excess,),
+            )
+
+    def close(self, **kwargs):
+        pass
@@ -0,0 +1,74 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в нескольких потоках'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=4, help='Количество потоков'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза, с, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        self.done = 0
+        self.lock = threading.Lock()
+        tasks.release_stale()
+        try:
+            if options['threads'] == 1:
+                self.work(options)
+            else:
+                self.work_in_threads(options)
+        except KeyboardInterrupt:
+            # Потоки доделывают текущие задачи и выходят
+            self.stopping.set()
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {self.done}'))
+
+    def work_in_threads(self, options):
+        with ThreadPoolExecutor(options['threads']) as pool:
+            workers = [
+                pool.submit(self.work, options)
+                for _ in range(options['threads'])
+            ]
+            try:
+                for worker in workers:
+                    worker.result()
+            except KeyboardInterrupt:
+                self.stopping.set()
+                raise
+
+    def work(self, options):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                queued = tasks.claim()
+                if queued is None:
+                    if options['once']:
+                        return
+                    tasks.release_stale()
+                    self.stopping.wait(options['poll'])
+                    continue
+                started = time.monotonic()
+                status = tasks.execute(queued)
+                self.stdout.write('{} {}: {:.0f} мс'.format(
+                    queued, status, (time.monotonic() - started) * 1000
+                ))
+                with self.lock:
+                    self.done += 1
+        finally:
+            connection.close()
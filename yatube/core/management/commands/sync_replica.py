@@ -0,0 +1,40 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу default в файлы реплик SQLite, '
+        'чтобы проверить чтение с реплик локально'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Реплики, по умолчанию все из REPLICA_DATABASES',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.REPLICA_DATABASES
+        if not aliases:
+            raise CommandError('Не настроено ни одной реплики')
+        primary = connections[DEFAULT_DB_ALIAS]
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Неизвестная база {alias}')
+            replica = connections[alias]
+            if {primary.vendor, replica.vendor} != {'sqlite'}:
+                raise CommandError('Копирование поддерживается только SQLite')
+            replica.close()
+            # backup копирует согласованный снимок даже во время записи
+            source = sqlite3.connect(primary.settings_dict['NAME'])
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(self.style.SUCCESS(f'Реплика {alias} обновлена'))
@@ -0,0 +1,198 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.urls import URLResolver, get_resolver
+
+KEY = 'perf:{}:{}'
+# Верхние границы корзин гистограммы времени ответа, мс
+BUCKETS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, None)
+DURATIONS = ('db', 'template', 'thumbnail')
+COUNTERS = ('queries', 'cache_hits', 'cache_misses')
+FIELDS = ('count', 'total', *DURATIONS, *COUNTERS)
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Время и счетчики одного запроса."""
+
+    def __init__(self):
+        self.durations = dict.fromkeys(DURATIONS, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.depth = {}
+        # Время служебной работы (планы медленных запросов), не входит
+        # ни в один замер
+        self.excluded = 0.0
+
+    def server_timing(self, total):
+        hits = self.counters['cache_hits']
+        misses = self.counters['cache_misses']
+        return ', '.join([
+            'db;dur={:.1f};desc="{} queries"'.format(
+                self.durations['db'] * 1000, self.counters['queries']
+            ),
+            'template;dur={:.1f}'.format(self.durations['template'] * 1000),
+            'thumbnail;dur={:.1f}'.format(
+                self.durations['thumbnail'] * 1000
+            ),
+            f'cache;desc="hit={hits} miss={misses}"',
+            'total;dur={:.1f}'.format(total * 1000),
+        ])
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def stop():
+    _local.metrics = None
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def timed(name):
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    # Вложенные замеры (include, повторный рендер) не суммируются дважды
+    depth = metrics.depth.get(name, 0)
+    metrics.depth[name] = depth + 1
+    started = time.perf_counter()
+    excluded = metrics.excluded
+    try:
+        yield
+    finally:
+        metrics.depth[name] = depth
+        if not depth:
+            metrics.durations[name] += (
+                time.perf_counter() - started
+                - (metrics.excluded - excluded)
+            )
+
+
+@contextmanager
+def excluded():
+    """Запросы и время внутри блока не попадают в замеры запроса."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    _local.metrics = None
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.metrics = metrics
+        metrics.excluded += time.perf_counter() - started
+
+
+def count(name, delta=1):
+    metrics = current()
+    if metrics is not None:
+        metrics.counters[name] += delta
+
+
+def record_query(execute, sql, params, many, context):
+    count('queries')
+    with timed('db'):
+        return execute(sql, params, many, context)
+
+
+def _bucket(bound):
+    return f'le_{bound or "inf"}'
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, delta)
+
+
+def record(view_name, metrics, total):
+    """Добавляет запрос в гистограмму представления.
+
+    Время хранится целыми микросекундами: incr атомарен в любом кэше,
+    поэтому данные воркеров складываются без гонок.
+    """
+    bound = next(
+        bound for bound in BUCKETS if bound is None or total * 1000 <= bound
+    )
+    values = {
+        'count': 1,
+        'total': total,
+        **metrics.durations,
+        **metrics.counters,
+        _bucket(bound): 1,
+    }
+    for field in DURATIONS + ('total',):
+        values[field] = int(values[field] * 1e6)
+    for field, value in values.items():
+        if value:
+            _incr(KEY.format(view_name, field), value)
+
+
+def view_names(resolver=None, namespace=''):
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            prefix = namespace
+            if pattern.namespace:
+                prefix = f'{namespace}{pattern.namespace}:'
+            yield from view_names(pattern, prefix)
+        else:
+            yield namespace + (pattern.name or pattern.lookup_str)
+
+
+def _fields():
+    return FIELDS + tuple(_bucket(bound) for bound in BUCKETS)
+
+
+def histogram():
+    """Сводка по представлениям, самые затратные по общему времени первыми."""
+    names = list(dict.fromkeys(view_names()))
+    fields = _fields()
+    values = cache.get_many(
+        [KEY.format(name, field) for name in names for field in fields]
+    )
+    views = []
+    for name in names:
+        row = {
+            field: values.get(KEY.format(name, field), 0) for field in fields
+        }
+        requests = row['count']
+        if not requests:
+            continue
+        views.append({
+            'view': name,
+            'count': requests,
+            'total_ms': row['total'] / 1000,
+            'mean_ms': row['total'] / requests / 1000,
+            **{
+                f'mean_{field}_ms': row[field] / requests / 1000
+                for field in DURATIONS
+            },
+            'mean_queries': row['queries'] / requests,
+            'cache_hits': row['cache_hits'],
+            'cache_misses': row['cache_misses'],
+            'buckets': {
+                str(bound or '+Inf'): row[_bucket(bound)]
+                for bound in BUCKETS
+            },
+        })
+    return sorted(views, key=lambda view: -view['total_ms'])
+
+
+def reset():
+    fields = _fields()
+    cache.delete_many([
+        KEY.format(name, field)
+        for name in set(view_names()) for field in fields
+    ])
@@ -0,0 +1,85 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import metrics, routers
+from .querylog import QueryLog
+
+
+class PerformanceMiddleware:
+    """Замеры запроса в заголовке Server-Timing и гистограмме по view.
+
+    Включается настройкой PERFORMANCE_METRICS и должна стоять первой
+    в MIDDLEWARE, чтобы total включал работу остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        total = time.perf_counter() - started - request_metrics.excluded
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        match = request.resolver_match
+        if match is not None:
+            metrics.record(match.view_name, request_metrics, total)
+        return response
+
+
+class SlowQueryMiddleware:
+    """Журнал медленных запросов, включается SLOW_QUERY_THRESHOLD."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_log = QueryLog(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(query_log))
+            response = self.get_response(request)
+        query_log.report()
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет пользователя за primary после записи.
+
+    Пока жива кука REPLICA_PIN_COOKIE, read_replica читает с primary,
+    поэтому автор видит свой пост или комментарий до того, как они
+    дойдут до реплик.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start_request()
+        primary = connections[DEFAULT_DB_ALIAS]
+        with primary.execute_wrapper(routers.record_write):
+            response = self.get_response(request)
+        if routers.wrote():
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True,
+            )
+        return response
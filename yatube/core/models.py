@@ -0,0 +1,49 @@
+from django.db import models
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Функция', max_length=200)
+    payload = models.TextField('Аргументы (JSON)', default='{}')
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text='Повторная постановка с тем же ключом не создает задачу',
+    )
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    status = models.CharField(
+        'Состояние', max_length=10, choices=STATUSES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField('Наибольшее число попыток')
+    run_after = models.DateTimeField('Не раньше')
+    locked_until = models.DateTimeField('Занята до', null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'задача'
+        verbose_name_plural = 'задачи'
+        indexes = [
+            models.Index(
+                fields=['status', '-priority', 'run_after'],
+                name='task_queue_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,91 @@
+import logging
+import re
+import reprlib
+import time
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Списки IN разной длины и числа в SQL дают один и тот же вид запроса
+IN_LIST = re.compile(r'\((?:%s, )*%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+
+def query_shape(sql):
+    return NUMBER.sub('?', IN_LIST.sub('(...)', sql))
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    prefix = 'EXPLAIN '
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception as error:
+        return f'не удалось получить план: {error}'
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+class QueryLog:
+    """Обертка execute_wrapper, собирающая запросы одного HTTP-запроса.
+
+    Запросы дольше SLOW_QUERY_THRESHOLD мс пишутся в лог сразу вместе
+    с планом, а одинаковые по виду запросы, повторенные не меньше
+    SLOW_QUERY_REPEATS раз, в конце отмечаются как подозрение на N+1.
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.shapes = {}
+        self.explaining = False
+
+    @property
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None:
+            return getattr(self.request, 'path', '-')
+        return match.view_name
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - started) * 1000
+        shape = self.shapes.setdefault(query_shape(sql), [0, 0.0, sql])
+        shape[0] += 1
+        shape[1] += duration
+        if duration >= settings.SLOW_QUERY_THRESHOLD and not many:
+            self.explaining = True
+            try:
+                with metrics.excluded():
+                    plan = explain(context['connection'], sql, params)
+            finally:
+                self.explaining = False
+            logger.warning(
+                'Медленный запрос %.1f мс в %s\n%s\nПараметры: %s\n'
+                'План:\n%s',
+                duration, self.view_name, sql, reprlib.repr(params), plan,
+            )
+        return result
+
+    def suspects(self):
+        return [
+            (sql, repeats, duration)
+            for repeats, duration, sql in self.shapes.values()
+            if repeats >= settings.SLOW_QUERY_REPEATS
+        ]
+
+    def report(self):
+        for sql, repeats, duration in self.suspects():
+            logger.warning(
+                'Возможный N+1 в %s: %d одинаковых запросов, %.1f мс\n%s',
+                self.view_name, repeats, duration, sql,
+            )
@@ -0,0 +1,90 @@
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import auth
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD')
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_local = threading.local()
+
+
+class ReplicaRouter:
+    """Чтение внутри read_replica уходит на реплику, запись - на primary.
+
+    Запись всегда идет в default, поэтому db_for_write не задан.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Запрос, который уже что-то записал, дальше читает с primary:
+        # реплика его запись еще не видит
+        if wrote():
+            return None
+        return getattr(_local, 'replica', None)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+@contextmanager
+def using(alias):
+    previous = getattr(_local, 'replica', None)
+    _local.replica = alias
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def primary():
+    return using(None)
+
+
+def start_request():
+    _local.replica = None
+    _local.wrote = False
+
+
+def record_write(execute, sql, params, many, context):
+    # get_or_create и select_for_update тоже спрашивают db_for_write,
+    # поэтому запись определяется по самому SQL
+    if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+        _local.wrote = True
+    return execute(sql, params, many, context)
+
+
+def wrote():
+    return getattr(_local, 'wrote', False)
+
+
+def is_pinned(request):
+    return settings.REPLICA_PIN_COOKIE in request.COOKIES
+
+
+def read_replica(view):
+    """Читает данные представления с одной из реплик.
+
+    Запросы с изменениями и пользователи, недавно что-то записавшие,
+    по-прежнему читают с primary. GET, который сам что-то записал,
+    после записи тоже читает с primary.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        replicas = settings.REPLICA_DATABASES
+        if (not replicas or request.method not in SAFE_METHODS
+                or is_pinned(request)):
+            return view(request, *args, **kwargs)
+        # request.user загружается лениво, при первом обращении. Сессию
+        # и пользователя нужно прочитать с primary до переключения на
+        # реплику: там только что выполненный вход может быть еще не виден.
+        request.user = auth.get_user(request)
+        with using(random.choice(replicas)):
+            return view(request, *args, **kwargs)
+    return wrapper
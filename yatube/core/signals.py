@@ -0,0 +1,14 @@
+from django.core.signals import request_finished, request_started
+from django.dispatch import receiver
+
+from . import tasks
+
+
+@receiver(request_started)
+def tasks_request_started(sender, **kwargs):
+    tasks.start_request()
+
+
+@receiver(request_finished)
+def tasks_request_finished(sender, **kwargs):
+    tasks.finish_request()
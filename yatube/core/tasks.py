@@ -0,0 +1,181 @@
+"""Очередь фоновых задач в базе данных.
+
+Задача - функция, помеченная @task. enqueue сохраняет вызов в той же
+транзакции, что и изменения запроса, а выполняет его run_worker. Без
+отдельного воркера (TASK_WORKER = False) задачи, поставленные запросом,
+выполняются тем же процессом после отправки ответа.
+"""
+import json
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+def task(priority=0, max_attempts=None):
+    def decorator(func):
+        func.task_options = {
+            'priority': priority,
+            'max_attempts': max_attempts or settings.TASK_MAX_ATTEMPTS,
+        }
+        return func
+    return decorator
+
+
+def enqueue(func, args=(), kwargs=None, key=None, priority=None):
+    """Ставит func(*args, **kwargs) в очередь и возвращает задачу.
+
+    Если задача с таким key еще ждет или выполняется, новая не создается.
+    Проваленная задача держит key еще TASK_FAILED_COOLDOWN секунд.
+    """
+    options = func.task_options
+    fields = {
+        'name': f'{func.__module__}.{func.__qualname__}',
+        'payload': json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        'priority': options['priority'] if priority is None else priority,
+        'max_attempts': options['max_attempts'],
+        'run_after': timezone.now(),
+    }
+    if key is None:
+        queued = Task.objects.create(**fields)
+    else:
+        # Сначала только чтение: обычно задача с ключом уже стоит, и
+        # запись в очередь не нужна
+        cooldown = fields['run_after'] - timedelta(
+            seconds=settings.TASK_FAILED_COOLDOWN
+        )
+        held = Task.objects.filter(key=key).filter(
+            Q(status__in=[Task.PENDING, Task.RUNNING])
+            | Q(status=Task.FAILED, finished__gt=cooldown)
+        ).first()
+        if held is not None:
+            return held
+        # Выполненную задачу можно поставить снова, например если
+        # миниатюру нужно создать еще раз
+        Task.objects.filter(
+            key=key, status__in=[Task.DONE, Task.FAILED]
+        ).update(key=None)
+        queued, created = Task.objects.get_or_create(key=key, defaults=fields)
+        if not created:
+            return queued
+    if not settings.TASK_WORKER:
+        transaction.on_commit(lambda: _defer(queued.pk))
+    return queued
+
+
+def start_request():
+    _local.pending = []
+
+
+def finish_request():
+    # request_finished приходит, когда ответ уже отдан клиенту
+    pending, _local.pending = getattr(_local, 'pending', None), None
+    for pk in pending or ():
+        run(pk)
+
+
+def _defer(pk):
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        run(pk)
+    else:
+        pending.append(pk)
+
+
+def _claim(tasks, now):
+    return tasks.filter(status=Task.PENDING).update(
+        status=Task.RUNNING,
+        attempts=F('attempts') + 1,
+        locked_until=now + timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+    )
+
+
+def claim():
+    """Берет самую приоритетную готовую задачу или возвращает None.
+
+    Захват - условный UPDATE, поэтому одну задачу не возьмут два
+    воркера одновременно.
+    """
+    now = timezone.now()
+    candidates = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=now
+    ).order_by('-priority', 'run_after').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        if _claim(Task.objects.filter(pk=pk), now):
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def release_stale():
+    """Возвращает в очередь задачи воркеров, которые упали."""
+    return Task.objects.filter(
+        status=Task.RUNNING, locked_until__lt=timezone.now()
+    ).update(status=Task.PENDING, locked_until=None)
+
+
+def run(pk):
+    if _claim(Task.objects.filter(pk=pk), timezone.now()):
+        execute(Task.objects.get(pk=pk))
+
+
+def execute(queued):
+    now = timezone.now()
+    try:
+        func = import_string(queued.name)
+        if not hasattr(func, 'task_options'):
+            raise ValueError(f'{queued.name} не помечена как задача')
+    except (ImportError, ValueError):
+        # Повтор не поможет: функцию переименовали или сняли с нее @task
+        logger.exception('Задача %s не найдена', queued)
+        queued.last_error = traceback.format_exc()
+        queued.status = Task.FAILED
+        queued.finished = now
+    else:
+        _call(queued, func, now)
+    queued.locked_until = None
+    queued.save(update_fields=[
+        'status', 'run_after', 'locked_until', 'last_error', 'finished'
+    ])
+    return queued.status
+
+
+def _call(queued, func, now):
+    try:
+        payload = json.loads(queued.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        logger.exception('Задача %s завершилась с ошибкой', queued)
+        queued.last_error = traceback.format_exc()
+        if queued.attempts >= queued.max_attempts:
+            queued.status = Task.FAILED
+            queued.finished = now
+        else:
+            # Пауза удваивается с каждой неудачной попыткой
+            queued.status = Task.PENDING
+            queued.run_after = now + timedelta(
+                seconds=settings.TASK_RETRY_DELAY * 2 ** (queued.attempts - 1)
+            )
+    else:
+        queued.status = Task.DONE
+        queued.finished = now
+
+
+@task(priority=10)
+def send_email(subject, body, from_email, to, html_body=None):
+    message = EmailMultiAlternatives(subject, body, from_email, to)
+    if html_body:
+        message.attach_alternative(html_body, 'text/html')
+    message.send()
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.name = os.path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def connect(self, **options):
+        connection = ConnectionHandler({'default': {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': self.name,
+            'OPTIONS': options,
+        }})['default']
+        self.addCleanup(connection.close)
+        return connection
+
+    def test_pragmas_applied(self):
+        """PRAGMA из OPTIONS выполняются для каждого соединения."""
+        connection = self.connect(
+            pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL'}
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_immediate_transactions(self):
+        """Транзакция IMMEDIATE сразу берет блокировку записи, а
+        DEFERRED в режиме WAL не мешает писать, пока только читает."""
+        writer = self.connect(timeout=0.1, pragmas={'journal_mode': 'WAL'})
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER)')
+        for mode, locked in (('DEFERRED', False), ('IMMEDIATE', True)):
+            with self.subTest(mode=mode):
+                reader = self.connect(transaction_mode=mode)
+                reader._start_transaction_under_autocommit()
+                reader.cursor().execute('SELECT * FROM item')
+                insert = 'INSERT INTO item VALUES (1)'
+                if locked:
+                    with self.assertRaises(OperationalError):
+                        writer.cursor().execute(insert)
+                else:
+                    writer.cursor().execute(insert)
+                reader.cursor().execute('ROLLBACK')
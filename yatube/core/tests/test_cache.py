@@ -0,0 +1,97 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+INCREMENTS = 50
+WORKERS = 4
+
+
+def increment(location):
+    cache = SQLiteCache(location, {})
+    for _ in range(INCREMENTS):
+        cache.incr('counter')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        options.setdefault('ACCESS_RESOLUTION', 0)
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_and_expire(self):
+        """Значения сохраняются, читаются и устаревают по таймауту."""
+        self.cache.set('key', {'posts': [1, 2]})
+        self.cache.set('expired', 'value', -1)
+        self.assertEqual(self.cache.get('key'), {'posts': [1, 2]})
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 'new'))
+        self.assertFalse(self.cache.add('key', 'new'))
+        self.cache.delete('key')
+        self.assertFalse(self.cache.has_key('key'))
+
+    def test_cache_is_shared_between_instances(self):
+        """Второй экземпляр (другой процесс) видит те же записи."""
+        self.cache.set('key', 'value')
+        self.assertEqual(self.make_cache().get('key'), 'value')
+
+    def test_versions(self):
+        """Версии ключей хранятся раздельно."""
+        self.cache.set('key', 'first', version=1)
+        self.cache.set('key', 'second', version=2)
+        self.assertEqual(self.cache.get('key', version=1), 'first')
+        self.cache.incr_version('key', version=2)
+        self.assertEqual(self.cache.get('key', version=3), 'second')
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет приращения."""
+        self.cache.set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.location,))
+            for _ in range(WORKERS)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), INCREMENTS * WORKERS)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """При переполнении удаляются давно не читанные записи."""
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, CULL_INTERVAL=1
+        )
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('d'), 'd')
+
+    def test_entries_are_counted_once_per_interval(self):
+        """Число записей считается не на каждой записи в кэш."""
+        cache = self.make_cache(MAX_ENTRIES=2, CULL_INTERVAL=3)
+        counts = []
+        cache._db.set_trace_callback(
+            lambda sql: counts.append(sql) if 'COUNT' in sql else None
+        )
+        for key in ('a', 'b', 'c', 'd', 'e'):
+            cache.set(key, key)
+        self.assertEqual(len(counts), 2)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('e'), 'e')
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import metrics
+
+User = get_user_model()
+
+
+@override_settings(PERFORMANCE_METRICS=True)
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        Post.objects.create(author=self.author, text='Пост')
+        self.staff = User.objects.create_user(username='staff', is_staff=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+        cache.clear()
+
+    def timings(self, response):
+        return {
+            item.split(';')[0]: item
+            for item in response['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing_header(self):
+        """Ответ содержит время БД, шаблонов, миниатюр и попадания в кэш."""
+        response = self.client.get(reverse('posts:main_page'))
+        timings = self.timings(response)
+        self.assertEqual(
+            set(timings), {'db', 'template', 'thumbnail', 'cache', 'total'}
+        )
+        self.assertNotIn('miss=0"', timings['cache'])
+        self.assertNotIn('desc="0 queries"', timings['db'])
+        timings = self.timings(self.client.get(reverse('posts:main_page')))
+        self.assertIn(' miss=0"', timings['cache'])
+        self.assertNotIn('hit=0 ', timings['cache'])
+
+    def test_histogram_by_view(self):
+        """Сводка собирает запросы по представлениям только для staff."""
+        for _ in range(3):
+            self.client.get(reverse('posts:main_page'))
+        self.client.get(reverse('posts:profile', args=[self.author]))
+        response = self.client.get(reverse('core:performance'))
+        self.assertEqual(response.status_code, 302)
+        views = {
+            view['view']: view
+            for view in self.staff_client.get(
+                reverse('core:performance')
+            ).json()['views']
+        }
+        index = views['posts:main_page']
+        self.assertEqual(index['count'], 3)
+        self.assertEqual(sum(index['buckets'].values()), 3)
+        self.assertGreater(index['cache_misses'], 0)
+        self.assertGreater(index['cache_hits'], index['cache_misses'])
+        self.assertGreater(index['mean_queries'], 0)
+        self.assertGreater(index['mean_template_ms'], 0)
+        self.assertEqual(views['posts:profile']['count'], 1)
+        self.staff_client.post(reverse('core:performance'))
+        views = self.staff_client.get(reverse('core:performance')).json()
+        self.assertEqual(
+            [view['view'] for view in views['views']], ['core:performance']
+        )
+
+    def test_every_cache_read_is_counted(self):
+        """Попадания и промахи считает бэкенд кэша, включая фрагменты
+        {% cache %} и get_many."""
+        request_metrics = metrics.start()
+        try:
+            cache.set('present', 1)
+            cache.get('present')
+            cache.get('absent')
+            cache.get_many(['present', 'absent'])
+        finally:
+            metrics.stop()
+        self.assertEqual(request_metrics.counters['cache_hits'], 2)
+        self.assertEqual(request_metrics.counters['cache_misses'], 2)
+
+    @override_settings(PERFORMANCE_METRICS=False)
+    def test_disabled(self):
+        """Без настройки заголовок не добавляется."""
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertFalse(response.has_header('Server-Timing'))
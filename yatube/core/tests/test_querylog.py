@@ -0,0 +1,69 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..querylog import QueryLog, query_shape
+
+User = get_user_model()
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_REPEATS=3)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {index}')
+            for index in range(3)
+        ]
+
+    def test_slow_query_logged_with_plan(self):
+        """Медленный запрос пишется с SQL, параметрами, view и планом."""
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            self.client.get(reverse('posts:profile', args=[self.author]))
+        messages = '\n'.join(logs.output)
+        self.assertIn('в posts:profile', messages)
+        self.assertIn('Параметры:', messages)
+        self.assertRegex(messages, r'План:\n.*(SEARCH|SCAN)')
+
+    @override_settings(SLOW_QUERY_THRESHOLD=10 ** 6)
+    def test_repeated_queries_flagged(self):
+        """Одинаковые запросы в цикле отмечаются как N+1."""
+        query_log = QueryLog()
+        with connection.execute_wrapper(query_log):
+            for post in self.posts:
+                Post.objects.get(pk=post.pk)
+            Post.objects.filter(pk__in=[1, 2]).first()
+        self.assertEqual(len(query_log.suspects()), 1)
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            query_log.report()
+        self.assertIn('3 одинаковых запросов', logs.output[0])
+
+    def test_query_shape(self):
+        """Длина списка IN и числа не меняют вид запроса."""
+        self.assertEqual(
+            query_shape('SELECT 1 FROM t WHERE id IN (%s, %s) LIMIT 21'),
+            query_shape('SELECT 1 FROM t WHERE id IN (%s) LIMIT 10'),
+        )
+
+    def test_plans_not_counted_in_metrics(self):
+        """Запросы плана не попадают в число запросов Server-Timing."""
+        url = reverse('posts:profile', args=[self.author])
+
+        def queries():
+            cache.clear()
+            # Новый клиент заново читает настройки middleware
+            response = Client().get(url)
+            header = response['Server-Timing']
+            return int(re.search(r'"(\d+) queries"', header).group(1))
+
+        with override_settings(PERFORMANCE_METRICS=True):
+            with self.assertLogs('core.querylog', 'WARNING'):
+                logged = queries()
+            with override_settings(SLOW_QUERY_THRESHOLD=None):
+                self.assertEqual(queries(), logged)
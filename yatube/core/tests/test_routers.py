@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+from .. import routers
+
+User = get_user_model()
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRouterTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(title='Группа', slug='group')
+        self.post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        cache.clear()
+
+    def get(self, client, url):
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                response = client.get(url)
+        return response, len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        """Страницы лент и постов читают данные с реплики."""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        # Те же строки на реплике, как после репликации
+        for obj in (self.author, self.author.stats, self.group, self.post):
+            type(obj).objects.using('replica').bulk_create([obj])
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                # Со второго раза страница ленты берется из кэша
+                self.get(reader_client, url)
+                response, _, replica = self.get(reader_client, url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(replica, 0)
+                self.assertNotIn('primary_pin', response.cookies)
+
+    def test_feed_cache_filled_from_primary(self):
+        """Страница ленты для кэша собирается с primary."""
+        response, primary, _ = self.get(
+            self.client, reverse('posts:main_page')
+        )
+        self.assertIn(self.post, response.context['page_obj'])
+        self.assertGreater(primary, 0)
+
+    def test_writer_pinned_to_primary(self):
+        """После записи пользователь читает с primary."""
+        response = self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        cookie = response.cookies['primary_pin']
+        self.assertEqual(cookie['max-age'], 10)
+        response, _, replica = self.get(
+            self.author_client, reverse('posts:profile', args=[self.author])
+        )
+        self.assertEqual(replica, 0)
+        self.assertContains(response, 'Новый пост')
+        response = self.client.get(reverse('posts:main_page'))
+        self.assertNotIn('primary_pin', response.cookies)
+
+    def test_reads_after_write_go_to_primary(self):
+        """Если запрос что-то записал, дальше он читает с primary."""
+        routers.start_request()
+        primary = connections['default']
+        with primary.execute_wrapper(routers.record_write):
+            with routers.using('replica'):
+                self.assertEqual(Post.objects.all().db, 'replica')
+                Group.objects.create(title='Новая группа', slug='new')
+                self.assertEqual(Post.objects.all().db, 'default')
+        # Состояние потока не должно перейти в другие тесты
+        routers.start_request()
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import tasks
+from ..models import Task
+
+User = get_user_model()
+CALLS = []
+
+
+@tasks.task()
+def remember(value):
+    CALLS.append(value)
+
+
+@tasks.task(max_attempts=2)
+def failing():
+    raise ValueError('ошибка')
+
+
+@override_settings(TASK_WORKER=True)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_idempotency_key(self):
+        """Повторная постановка с тем же ключом не создает задачу."""
+        first = tasks.enqueue(remember, [1], key='remember:1')
+        with self.assertNumQueries(1):
+            second = tasks.enqueue(remember, [2], key='remember:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Task.objects.count(), 1)
+        tasks.execute(tasks.claim())
+        third = tasks.enqueue(remember, [3], key='remember:1')
+        self.assertNotEqual(third.pk, first.pk)
+        self.assertEqual(third.status, Task.PENDING)
+        first.refresh_from_db()
+        self.assertIsNone(first.key)
+
+    def test_failed_key_is_not_requeued(self):
+        """Проваленная задача держит ключ, пока не пройдет пауза."""
+        first = tasks.enqueue(failing, key='failing')
+        Task.objects.update(attempts=1)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.execute(tasks.claim()), Task.FAILED)
+        with self.assertNumQueries(1):
+            again = tasks.enqueue(failing, key='failing')
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Task.objects.count(), 1)
+        Task.objects.update(finished=timezone.now() - timedelta(
+            seconds=settings.TASK_FAILED_COOLDOWN + 1
+        ))
+        later = tasks.enqueue(failing, key='failing')
+        self.assertNotEqual(later.pk, first.pk)
+        self.assertEqual(later.status, Task.PENDING)
+
+    def test_priorities(self):
+        """Первой берется задача с большим приоритетом."""
+        tasks.enqueue(remember, ['обычная'])
+        tasks.enqueue(remember, ['срочная'], priority=5)
+        call_command('run_worker', '--once', '--threads', '1',
+                     stdout=StringIO())
+        self.assertEqual(CALLS, ['срочная', 'обычная'])
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
+
+    def test_retries(self):
+        """Упавшая задача повторяется позже, после всех попыток -
+        отмечается невыполненной."""
+        queued = tasks.enqueue(failing)
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.execute(tasks.claim()), Task.PENDING)
+        queued.refresh_from_db()
+        self.assertGreater(queued.run_after, timezone.now())
+        self.assertIn('ValueError', queued.last_error)
+        self.assertIsNone(tasks.claim())
+        Task.objects.update(run_after=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(tasks.execute(tasks.claim()), Task.FAILED)
+        queued.refresh_from_db()
+        self.assertEqual(queued.attempts, 2)
+
+    def test_unknown_task_fails(self):
+        """Задача с неизвестной функцией сразу отмечается невыполненной,
+        а воркер продолжает работу."""
+        tasks.enqueue(remember, [1])
+        tasks.enqueue(remember, [2])
+        Task.objects.filter(payload__contains='1').update(
+            name='core.tests.test_tasks.renamed'
+        )
+        Task.objects.filter(payload__contains='2').update(
+            name='core.tasks.claim'
+        )
+        with self.assertLogs('core.tasks', 'ERROR'):
+            call_command('run_worker', '--once', '--threads', '1',
+                         stdout=StringIO())
+        self.assertEqual(
+            Task.objects.filter(status=Task.FAILED, attempts=1).count(), 2
+        )
+        renamed = Task.objects.get(name__endswith='renamed')
+        self.assertIn('ImportError', renamed.last_error)
+
+    def test_stale_tasks_released(self):
+        """Задача упавшего воркера возвращается в очередь."""
+        tasks.enqueue(remember, [1])
+        self.assertIsNotNone(tasks.claim())
+        self.assertIsNone(tasks.claim())
+        Task.objects.update(locked_until=timezone.now() - timedelta(1))
+        self.assertEqual(tasks.release_stale(), 1)
+        tasks.execute(tasks.claim())
+        self.assertEqual(CALLS, [1])
+
+    def test_password_reset_enqueued(self):
+        """Письмо для сброса пароля отправляет воркер, а не запрос."""
+        User.objects.create_user(
+            username='auth', email='auth@example.com', password='пароль'
+        )
+        response = self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'auth@example.com'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        call_command('run_worker', '--once', '--threads', '1',
+                     stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['auth@example.com'])
+
+
+class AfterResponseTests(TransactionTestCase):
+    def test_password_reset_after_response(self):
+        """Без воркера письмо отправляется тем же процессом после
+        ответа."""
+        User.objects.create_user(
+            username='auth', email='auth@example.com', password='пароль'
+        )
+        response = self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'auth@example.com'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +12,13 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def performance(request):
+    if request.method == 'POST':
+        metrics.reset()
+    return JsonResponse({
+        'enabled': settings.PERFORMANCE_METRICS,
+        'views': metrics.histogram(),
+    }, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,277 @@
+import hashlib
+import math
+import random
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import transaction
+from django.views.decorators.http import condition
+
+from core import routers
+
+from .models import Follow, Post, TimelineEntry
+from .utils import CastomPaginator, KeysetPage
+
+VERSION_KEY = 'feed:version:{}'
+PAGE_KEY = 'feed:page:{}:{}'
+LOCK_KEY = 'feed:lock:{}'
+STATS_KEY = 'feed:stats:{}'
+EVENTS = ('hit', 'miss', 'stale', 'recompute')
+INDEX_SCOPE = 'index'
+# Меняется при пакетном пересчете рекомендаций
+RECOMMENDATIONS_SCOPE = 'recommendations'
+# Меняется при затухании оценок популярных постов
+TRENDING_SCOPE = 'trending'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def recommendations_scope(user_id):
+    return f'recommendations:{user_id}'
+
+
+def scope_version(scope):
+    key = VERSION_KEY.format(scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), settings.SCOPE_VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def _bump(scopes):
+    version = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(scope): version for scope in scopes},
+        settings.SCOPE_VERSION_TIMEOUT,
+    )
+
+
+def invalidate(*scopes):
+    """Меняет версии областей сразу и еще раз после коммита.
+
+    Конкурентный запрос может собрать страницу по данным до коммита уже
+    под новой версией; повторная смена версии после коммита не оставит
+    такую страницу в кэше.
+    """
+    scopes = set(scopes)
+    _bump(scopes)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def post_scopes(post, group_ids=()):
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    return [
+        INDEX_SCOPE,
+        post_scope(post.pk),
+        profile_scope(post.author_id),
+        *(group_scope(pk) for pk in {post.group_id, *group_ids} if pk),
+        *(follow_scope(user_id) for user_id in followers),
+    ]
+
+
+def invalidate_follow_feeds():
+    readers = TimelineEntry.objects.order_by().values_list(
+        'user_id', flat=True
+    ).distinct()
+    invalidate(*(follow_scope(user_id) for user_id in readers))
+
+
+def _page_key(request, scope):
+    params = '&'.join(
+        f'{name}={request.GET.get(name)}' for name in ('page', 'cursor')
+    )
+    digest = hashlib.md5(
+        f'{settings.PAGINATION_MODE}?{params}'.encode()
+    ).hexdigest()
+    return PAGE_KEY.format(scope, digest)
+
+
+def _record(event):
+    # Попадания в замерах запроса считает сам бэкенд кэша, здесь -
+    # только сводка по лентам
+    key = STATS_KEY.format(event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    values = cache.get_many([STATS_KEY.format(event) for event in EVENTS])
+    return {
+        event: values.get(STATS_KEY.format(event), 0) for event in EVENTS
+    }
+
+
+def reset_stats():
+    cache.delete_many([STATS_KEY.format(event) for event in EVENTS])
+
+
+def _is_fresh(entry, version):
+    entry_version, value, delta, expires = entry
+    # Вероятностное досрочное устаревание (XFetch): чем дороже расчет
+    # и ближе срок, тем вероятнее, что один из запросов обновит запись
+    # заранее, не дожидаясь одновременного промаха у всех.
+    early = -delta * settings.FEED_CACHE_BETA * math.log(
+        1 - random.random()
+    )
+    return entry_version == version and time.time() + early < expires
+
+
+def _wait_for(key, version):
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry
+    return None
+
+
+def get_or_compute(key, version, compute, timeout=None):
+    """Значение из кэша с защитой от одновременного пересчета.
+
+    Устаревшую по времени запись пересчитывает только тот запрос, который
+    взял блокировку, остальные в это время получают прежнее значение.
+    Запись прежней версии сброшена правкой и не отдается: запрос ждет
+    пересчета, а не дождавшись, считает сам.
+    """
+    timeout = timeout or settings.FEED_CACHE_TIMEOUT
+    lock = LOCK_KEY.format(key)
+    locked = False
+    entry = cache.get(key)
+    if entry is None:
+        _record('miss')
+    elif _is_fresh(entry, version):
+        _record('hit')
+        return entry[1]
+    elif cache.add(lock, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        _record('recompute')
+        locked = True
+    elif entry[0] == version:
+        _record('stale')
+        return entry[1]
+    else:
+        entry = _wait_for(key, version)
+        if entry is not None:
+            _record('hit')
+            return entry[1]
+        _record('miss')
+    try:
+        started = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - started
+        cache.set(
+            key,
+            (version, value, delta, time.time() + timeout),
+            timeout + settings.FEED_CACHE_STALE_TIMEOUT,
+        )
+    finally:
+        # Чужую блокировку не снимаем
+        if locked:
+            cache.delete(lock)
+    return value
+
+
+def _dump(page_obj):
+    ids = [post.pk for post in page_obj]
+    if getattr(page_obj, 'is_keyset', False):
+        return 'keyset', ids, page_obj.next_cursor, page_obj.previous_cursor
+    paginator = page_obj.paginator
+    return 'offset', ids, page_obj.number, paginator.count, paginator.per_page
+
+
+def _load(state):
+    mode, ids, *rest = state
+    posts = Post.objects.feed().in_bulk(ids)
+    object_list = [posts[pk] for pk in ids if pk in posts]
+    if mode == 'keyset':
+        next_cursor, previous_cursor = rest
+        return KeysetPage(object_list, None, next_cursor, previous_cursor)
+    number, count, per_page = rest
+    paginator = Paginator(object_list, per_page)
+    paginator.count = count
+    return Page(object_list, number, paginator)
+
+
+def feed_page(request, scope, objects):
+    """Страница ленты, у которой в кэше хранятся только id постов.
+
+    Кэш сбрасывается сменой версии области (invalidate), поэтому
+    время жизни может быть большим.
+    """
+    built = {}
+
+    def build():
+        # Кэш живет до следующей правки, поэтому страница собирается
+        # с primary: отставшая реплика не закрепит в нем старые данные.
+        with routers.primary():
+            page_obj = CastomPaginator(request, objects)
+            if objects.model is TimelineEntry:
+                page_obj.object_list = [entry.post for entry in page_obj]
+            built['page'] = page_obj
+            return _dump(page_obj)
+
+    state = get_or_compute(
+        _page_key(request, scope), scope_version(scope), build
+    )
+    if 'page' in built:
+        return built['page']
+    return _load(state)
+
+
+def conditional(get_scopes):
+    """Условный GET по версиям областей кэша.
+
+    get_scopes получает аргументы представления и возвращает области,
+    от которых зависит страница. Любая правка меняет их версию, поэтому
+    на повторный запрос без изменений отдается 304 без рендеринга.
+    """
+    def versions(request, *args, **kwargs):
+        # etag и last_modified вызываются по очереди, области ищутся раз
+        if not hasattr(request, 'scope_versions'):
+            request.scope_versions = [
+                scope_version(scope)
+                for scope in get_scopes(request, *args, **kwargs)
+            ]
+        return request.scope_versions
+
+    def etag(request, *args, **kwargs):
+        scope_versions = versions(request, *args, **kwargs)
+        if not scope_versions:
+            return None
+        # Страница зависит и от пользователя: шапка, кнопки подписки
+        raw = '{}|{}|{}'.format(
+            scope_versions, request.user.pk, request.get_full_path()
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        scope_versions = versions(request, *args, **kwargs)
+        if not scope_versions:
+            return None
+        return datetime.fromtimestamp(max(scope_versions) / 1e9, timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,62 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def get_stats(user):
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return recount_authors(User.objects.filter(pk=user.pk)).get()
+
+
+def change_author(user_id, field, delta):
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    updated = stats.update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        recount_authors(User.objects.filter(pk=user_id))
+
+
+def change_post(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def _count(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('user_id')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+def recount_authors(users=None):
+    users = User.objects.all() if users is None else users
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk) for pk in users.values_list('pk', flat=True)],
+        ignore_conflicts=True,
+    )
+    stats = AuthorStats.objects.filter(user__in=users)
+    stats.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(Follow.objects.all(), 'author'),
+        following_count=_count(Follow.objects.all(), 'user'),
+    )
+    return stats
+
+
+def recount_posts():
+    return Post.objects.update(comments_count=Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0))
@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .importer import MODELS
+
+CHUNK_SIZE = 5000
+CHECKPOINT = 'checkpoint.json'
+
+
+def file_name(label):
+    return f'{label}.ndjson.gz'
+
+
+class Checkpoint:
+    """Состояние выгрузки: последний pk и размер файла по каждой модели.
+
+    Пишется после каждой порции через временный файл, поэтому после
+    сбоя выгрузка продолжается с последней записанной порции.
+    """
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, CHECKPOINT)
+        try:
+            with open(self.path, encoding='utf-8') as checkpoint:
+                self.state = json.load(checkpoint)
+        except FileNotFoundError:
+            self.state = {}
+
+    def get(self, label):
+        return self.state.get(
+            label, {'last_pk': None, 'rows': 0, 'size': 0, 'done': False}
+        )
+
+    def save(self, label, **values):
+        self.state[label] = {**self.get(label), **values}
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump(self.state, checkpoint)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(temporary, self.path)
+
+
+def _serialize(label, model, rows):
+    # Формат записей dumpdata, чтобы выгрузку читал import_yatube
+    fields = [
+        (field.name, field.attname)
+        for field in model._meta.concrete_fields if not field.primary_key
+    ]
+    pk_name = model._meta.pk.attname
+    for row in rows:
+        record = {
+            'model': label,
+            'pk': row[pk_name],
+            'fields': {name: row[attname] for name, attname in fields},
+        }
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def export_model(label, directory, checkpoint, chunk_size=CHUNK_SIZE):
+    """Дописывает выгрузку модели порциями по возрастанию pk.
+
+    Каждая порция - отдельный член gzip, поэтому файл можно обрезать
+    до размера из контрольной точки и продолжить запись.
+    Возвращает число выгруженных строк.
+    """
+    state = checkpoint.get(label)
+    if state['done']:
+        return state['rows']
+    model = MODELS[label]
+    pk_name = model._meta.pk.attname
+    path = os.path.join(directory, file_name(label))
+    with open(path, 'ab') as output:
+        output.truncate(state['size'])
+    rows, last_pk = state['rows'], state['last_pk']
+    while True:
+        chunk = model._base_manager.order_by(pk_name)
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk.values()[:chunk_size])
+        if not chunk:
+            break
+        with open(path, 'ab') as output:
+            with gzip.GzipFile(fileobj=output, mode='wb') as archive:
+                for line in _serialize(label, model, chunk):
+                    archive.write(line.encode('utf-8') + b'\n')
+            output.flush()
+            os.fsync(output.fileno())
+            size = output.tell()
+        rows += len(chunk)
+        last_pk = chunk[-1][pk_name]
+        checkpoint.save(label, last_pk=last_pk, rows=rows, size=size)
+    checkpoint.save(label, done=True)
+    return rows
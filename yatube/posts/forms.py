@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import images
 from .models import Post, Comment
 
 
@@ -9,6 +11,24 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Обрезанный при загрузке файл не передается в ImageField,
+        # иначе вместо ошибки размера будет ошибка формата
+        upload = self.files.get('image')
+        self.image_too_large = bool(upload) and images.is_too_large(upload)
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        if self.image_too_large:
+            raise images.too_large_error()
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return images.normalize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,102 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Post
+from .stemmer import WORD, stem, stem_text
+
+TABLE = 'posts_post_fts'
+BATCH_SIZE = 1000
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, stem_text(post.text)],
+        )
+
+
+def unindex_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+@transaction.atomic
+def rebuild():
+    if not is_available():
+        return 0
+    posts = Post.objects.values_list('pk', 'text')
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        batch = []
+        for pk, text in posts.iterator(chunk_size=BATCH_SIZE):
+            batch.append((pk, stem_text(text)))
+            if len(batch) == BATCH_SIZE:
+                _insert(cursor, batch)
+                batch = []
+        _insert(cursor, batch)
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def _insert(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows
+    )
+
+
+def build_query(query):
+    # Каждое слово - отдельная фраза-префикс, так что пользовательский
+    # ввод не может нарушить синтаксис MATCH
+    return ' '.join(
+        '"{}"*'.format(stem(word).replace('"', '""'))
+        for word in WORD.findall(query)
+    )
+
+
+class SearchResults:
+    """Результаты поиска для Paginator: count() и срезы по рангу bm25."""
+
+    def __init__(self, query):
+        self.match = build_query(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not is_available():
+            return self._fallback().count()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s LIMIT %s)',
+                [self.match, settings.SEARCH_MAX_RESULTS],
+            )
+            return cursor.fetchone()[0]
+
+    def __getitem__(self, index):
+        if not is_available():
+            return list(self._fallback()[index])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.match, index.stop - index.start, index.start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def _fallback(self):
+        posts = Post.objects.feed()
+        for word in WORD.findall(self.match):
+            posts = posts.filter(text__icontains=word)
+        return posts[:settings.SEARCH_MAX_RESULTS]
@@ -0,0 +1,82 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+FORMAT = 'JPEG'
+CONTENT_TYPE = 'image/jpeg'
+EXTENSION = '.jpg'
+BACKGROUND = (255, 255, 255)
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше лимита.
+
+    Данные сверх POST_IMAGE_MAX_BYTES отбрасываются, а размер файла
+    остается настоящим, поэтому форма может сообщить об ошибке.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.POST_IMAGE_MAX_BYTES:
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+
+def is_too_large(upload):
+    return upload.size > settings.POST_IMAGE_MAX_BYTES
+
+
+def too_large_error():
+    return ValidationError(
+        'Файл больше %(limit)s МБ',
+        params={'limit': settings.POST_IMAGE_MAX_BYTES // 2 ** 20},
+        code='file_too_large',
+    )
+
+
+def normalize(upload):
+    if is_too_large(upload):
+        raise too_large_error()
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            code='image_too_large',
+        )
+    side = settings.POST_IMAGE_MAX_SIDE
+    # JPEG сразу декодируется в уменьшенном масштабе
+    image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((side, side))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, BACKGROUND)
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = BytesIO()
+    # EXIF и прочие метаданные не переносятся в новый файл
+    image.save(
+        output,
+        FORMAT,
+        quality=settings.POST_IMAGE_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+    name = os.path.splitext(os.path.basename(upload.name))[0] + EXTENSION
+    return InMemoryUploadedFile(
+        output, 'image', name, CONTENT_TYPE, output.tell(), None
+    )
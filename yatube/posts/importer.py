@@ -0,0 +1,173 @@
+import gzip
+import json
+import re
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import caching, counters, fulltext, timeline, trending
+from .models import Comment, Follow, Group, Post, User
+
+READ_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+# Порядок важен: в каждой транзакции сначала пишутся таблицы,
+# на которые ссылаются следующие.
+MODELS = {
+    'auth.user': User,
+    'posts.group': Group,
+    'posts.post': Post,
+    'posts.comment': Comment,
+    'posts.follow': Follow,
+}
+SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_objects(stream, read_size=READ_SIZE):
+    """Объекты из массива JSON или из JSON по строке, без чтения
+    всего файла в память."""
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if position < len(buffer):
+            try:
+                obj, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                continue
+        elif eof:
+            return
+        chunk = stream.read(read_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def _is_automatic(field):
+    return (getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False))
+
+
+class Builder:
+    """Собирает экземпляр модели из записи dumpdata."""
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = {
+            field.name: field for field in model._meta.concrete_fields
+        }
+        self.automatic = [
+            field.attname for field in self.fields.values()
+            if _is_automatic(field)
+        ]
+
+    def __call__(self, record):
+        values = {self.model._meta.pk.attname: record['pk']}
+        for name, value in record['fields'].items():
+            field = self.fields.get(name)
+            if field is None:
+                # Связи многие-ко-многим (группы и права пользователей)
+                # в выгрузках пустые и не переносятся.
+                continue
+            values[field.attname] = field.to_python(value)
+        now = timezone.now()
+        for attname in self.automatic:
+            values.setdefault(attname, now)
+        return self.model(**values)
+
+
+class KeepDates:
+    """Отключает auto_now и auto_now_add, чтобы bulk_create не
+    перезаписывал даты из выгрузки."""
+
+    def __enter__(self):
+        self.changed = []
+        for model in MODELS.values():
+            for field in model._meta.concrete_fields:
+                for attr in ('auto_now', 'auto_now_add'):
+                    if getattr(field, attr, False):
+                        setattr(field, attr, False)
+                        self.changed.append((field, attr))
+
+    def __exit__(self, *exc_info):
+        for field, attr in self.changed:
+            setattr(field, attr, True)
+
+
+def import_objects(objects, batch_size=BATCH_SIZE, ignore_conflicts=False,
+                   progress=None):
+    """Записывает объекты пачками, каждую пачку в своей транзакции.
+
+    Возвращает количество записанных и пропущенных объектов по моделям.
+    """
+    builders = {label: Builder(model) for label, model in MODELS.items()}
+    pending = {label: [] for label in MODELS}
+    counts = dict.fromkeys(MODELS, 0)
+    skipped = {}
+    size = 0
+
+    def flush():
+        with transaction.atomic():
+            for label, rows in pending.items():
+                # Размер одного INSERT подбирает бэкенд: у SQLite
+                # ограничено число параметров запроса
+                MODELS[label].objects.bulk_create(
+                    rows, ignore_conflicts=ignore_conflicts
+                )
+                counts[label] += len(rows)
+                rows.clear()
+        if progress:
+            progress(counts)
+
+    with KeepDates():
+        for record in objects:
+            label = record.get('model')
+            if label not in MODELS:
+                skipped[label] = skipped.get(label, 0) + 1
+                continue
+            pending[label].append(builders[label](record))
+            size += 1
+            if size >= batch_size:
+                flush()
+                size = 0
+        flush()
+    reset_sequences()
+    return counts, skipped
+
+
+def reset_sequences():
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), list(MODELS.values())
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """Пересобирает счетчики, ленты, поисковый индекс, популярные посты
+    и сбрасывает кэш лент: bulk_create не отправляет сигналы."""
+    with transaction.atomic():
+        counters.recount_authors()
+        counters.recount_posts()
+        timeline.rebuild()
+    fulltext.rebuild()
+    trending.rebuild()
+    caching.invalidate(
+        caching.INDEX_SCOPE,
+        *(caching.group_scope(pk)
+          for pk in Group.objects.values_list('pk', flat=True)),
+        *(caching.profile_scope(pk)
+          for pk in User.objects.values_list('pk', flat=True)),
+    )
+    caching.invalidate_follow_feeds()
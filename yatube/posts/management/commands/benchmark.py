@@ -0,0 +1,174 @@
+import json
+import math
+import resource
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import AuthorStats, Group, Post
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, percent):
+    # Ближайший ранг: значение, ниже или равное которому percent% выборки
+    ordered = sorted(values)
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число запросов к БД и память основных '
+        'страниц через тестовый клиент и пишет результаты в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Запросов к каждой странице в каждом режиме'
+        )
+        parser.add_argument(
+            '--output', default='benchmark.json', help='Файл результатов'
+        )
+        parser.add_argument(
+            '--compare', help='Прошлые результаты для сравнения p95'
+        )
+
+    def handle(self, *args, **options):
+        targets = self.targets()
+        if not targets:
+            raise CommandError(
+                'Нет данных для замеров, сначала выполните generate_data'
+            )
+        results = {}
+        for name, (client, url) in targets.items():
+            results[name] = {
+                'url': url,
+                'cold': self.measure(client, url, options['requests'], True),
+                'warm': self.measure(client, url, options['requests'], False),
+            }
+            self.stdout.write(self.row(name, results[name]))
+        report = {
+            'revision': git_revision(),
+            'created': timezone.now().isoformat(),
+            'settings': {
+                'PAGINATION_MODE': settings.PAGINATION_MODE,
+                'CACHE': settings.CACHES['default']['BACKEND'],
+            },
+            'requests': options['requests'],
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2, ensure_ascii=False)
+        if options['compare']:
+            self.compare(options['compare'], results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def targets(self):
+        """Страницы для замеров: самые нагруженные автор, группа, пост
+        и читатель с наибольшим числом подписок."""
+        author = AuthorStats.objects.order_by('-posts_count').first()
+        reader = AuthorStats.objects.order_by('-following_count').first()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total').first()
+        post = Post.objects.order_by('-comments_count').first()
+        if not (author and reader and post):
+            return {}
+        guest = Client()
+        follower = Client()
+        follower.force_login(reader.user)
+        targets = {
+            'index': (guest, reverse('posts:main_page')),
+            'index_deep': (
+                guest, reverse('posts:main_page') + '?page=100'
+            ),
+            'follow_index': (follower, reverse('posts:follow_index')),
+            'profile': (guest, reverse(
+                'posts:profile', kwargs={'username': author.user.username}
+            )),
+            'post_detail': (guest, reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            )),
+        }
+        if group:
+            targets['group_posts'] = (guest, reverse(
+                'posts:group_list', kwargs={'any_slug': group.slug}
+            ))
+        return targets
+
+    @staticmethod
+    def measure(client, url, requests, cold):
+        """Холодный режим сбрасывает кэш перед каждым запросом."""
+        timings, queries = [], []
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            if response.status_code != 200:
+                raise CommandError(f'{url}: статус {response.status_code}')
+        # Память меряется отдельным запросом: tracemalloc замедляет код
+        if cold:
+            cache.clear()
+        tracemalloc.start()
+        client.get(url)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result = {
+            f'p{percent}_ms': round(percentile(timings, percent), 2)
+            for percent in PERCENTILES
+        }
+        result['queries'] = max(queries)
+        result['peak_memory_kb'] = peak // 1024
+        return result
+
+    @staticmethod
+    def row(name, result):
+        modes = '; '.join(
+            '{}: p50 {p50_ms} p95 {p95_ms} p99 {p99_ms} мс, '
+            'запросов {queries}'.format(mode, **result[mode])
+            for mode in ('cold', 'warm')
+        )
+        return f'{name:<14} {modes}'
+
+    def compare(self, path, results):
+        with open(path, encoding='utf-8') as previous:
+            old = json.load(previous)['results']
+        for name, result in results.items():
+            if name not in old:
+                continue
+            for mode in ('cold', 'warm'):
+                before = old[name][mode]['p95_ms']
+                after = result[mode]['p95_ms']
+                change = (after - before) / before * 100 if before else 0
+                self.stdout.write(
+                    f'{name} {mode}: p95 {before} -> {after} мс '
+                    f'({change:+.0f}%)'
+                )
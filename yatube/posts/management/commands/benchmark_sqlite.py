@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.db import transaction
+
+from posts.models import Comment, Post, User
+
+from .benchmark import PERCENTILES, percentile
+
+# Запас на запуск Django в каждом процессе, чтобы все начали разом
+STARTUP_DELAY = 3
+
+
+def copy_database(path, journal_mode):
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        connection.connection.backup(target)
+        # Режим журнала хранится в файле и переходит вместе с копией
+        target.execute(f'PRAGMA journal_mode = {journal_mode}')
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает копию базы одновременным чтением и записью постов '
+        'и комментариев из нескольких процессов и сравнивает '
+        'пропускную способность профилей SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=8, help='Число процессов'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность нагрузки на профиль, с'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.3,
+            help='Доля операций записи'
+        )
+        parser.add_argument(
+            '--profiles', nargs='+', default=list(settings.SQLITE_PROFILES),
+            choices=list(settings.SQLITE_PROFILES),
+            help='Сравниваемые профили из SQLITE_PROFILES'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        # Служебные параметры процесса нагрузки
+        parser.add_argument(
+            '--worker', action='store_true', help=argparse.SUPPRESS
+        )
+        parser.add_argument(
+            '--start-at', type=float, default=0, help=argparse.SUPPRESS
+        )
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            return self.work(options)
+        if not Post.objects.exists():
+            raise CommandError(
+                'Нет данных для замеров, сначала выполните generate_data'
+            )
+        directory = tempfile.mkdtemp()
+        results = {}
+        try:
+            for profile in options['profiles']:
+                path = os.path.join(directory, f'{profile}.sqlite3')
+                pragmas = settings.SQLITE_PROFILES[profile].get(
+                    'OPTIONS', {}
+                ).get('pragmas', {})
+                copy_database(path, pragmas.get('journal_mode', 'DELETE'))
+                results[profile] = self.run(profile, path, options)
+                self.stdout.write(self.row(profile, results[profile]))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        first, *others = options['profiles']
+        before = results[first]['throughput']
+        for profile in others:
+            after = results[profile]['throughput']
+            if before:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{profile}: {after / before:.1f}x пропускной '
+                    f'способности {first}'
+                ))
+
+    def run(self, profile, path, options):
+        env = {
+            **os.environ,
+            'YATUBE_SQLITE_PROFILE': profile,
+            'YATUBE_DB_NAME': path,
+            # Сравниваются только профили базы, кэш у всех одинаковый
+            'YATUBE_CACHE': 'locmem',
+        }
+        env.pop('YATUBE_REPLICA_NAME', None)
+        start_at = time.time() + STARTUP_DELAY
+        workers = [
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    os.path.join(settings.BASE_DIR, 'manage.py'),
+                    'benchmark_sqlite', '--worker',
+                    '--start-at', str(start_at),
+                    '--duration', str(options['duration']),
+                    '--write-ratio', str(options['write_ratio']),
+                    '--seed', str(options['seed'] + index),
+                ],
+                env=env, stdout=subprocess.PIPE, text=True,
+            )
+            for index in range(options['processes'])
+        ]
+        totals = {'read_ms': [], 'write_ms': [], 'errors': 0}
+        for worker in workers:
+            output, _ = worker.communicate()
+            if worker.returncode:
+                raise CommandError('Процесс нагрузки завершился с ошибкой')
+            result = json.loads(output.splitlines()[-1])
+            for name, value in result.items():
+                totals[name] += value
+        operations = len(totals['read_ms']) + len(totals['write_ms'])
+        summary = {
+            'throughput': round(operations / options['duration']),
+            'reads': len(totals['read_ms']),
+            'writes': len(totals['write_ms']),
+            'errors': totals['errors'],
+        }
+        for kind in ('read', 'write'):
+            timings = totals[f'{kind}_ms'] or [0]
+            for percent in PERCENTILES:
+                summary[f'{kind}_p{percent}_ms'] = round(
+                    percentile(timings, percent), 2
+                )
+        return summary
+
+    @staticmethod
+    def row(profile, result):
+        return (
+            '{profile:<11} {throughput} оп/с (чтений {reads}, '
+            'записей {writes}, ошибок {errors}); чтение p50 '
+            '{read_p50_ms} p99 {read_p99_ms} мс; запись p50 '
+            '{write_p50_ms} p99 {write_p99_ms} мс'
+        ).format(profile=profile, **result)
+
+    def work(self, options):
+        """Один процесс нагрузки: операции идут как отдельные запросы,
+        между ними соединение закрывается, если профиль этого требует."""
+        rng = random.Random(options['seed'])
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        pages = max(len(post_ids) // settings.POSTS_ON_PAGE, 1)
+        close_old_connections()
+        time.sleep(max(options['start_at'] - time.time(), 0))
+        finish = time.time() + options['duration']
+        result = {'read_ms': [], 'write_ms': [], 'errors': 0}
+        while time.time() < finish:
+            write = rng.random() < options['write_ratio']
+            started = time.perf_counter()
+            try:
+                if write:
+                    self.write(rng, post_ids, user_ids)
+                else:
+                    self.read(rng, post_ids, pages)
+            except OperationalError:
+                result['errors'] += 1
+            else:
+                kind = 'write_ms' if write else 'read_ms'
+                result[kind].append((time.perf_counter() - started) * 1000)
+            close_old_connections()
+        self.stdout.write(json.dumps(result))
+
+    @staticmethod
+    def read(rng, post_ids, pages):
+        offset = rng.randrange(min(pages, 100)) * settings.POSTS_ON_PAGE
+        list(Post.objects.feed()[offset:offset + settings.POSTS_ON_PAGE])
+        list(
+            Comment.objects.filter(post_id=rng.choice(post_ids))
+            .select_related('author')[:settings.COMMENTS_ON_PAGE]
+        )
+
+    @staticmethod
+    def write(rng, post_ids, user_ids):
+        # Сигналы пересчитывают счетчики и ленты в той же транзакции
+        with transaction.atomic():
+            if rng.random() < 0.2:
+                Post.objects.create(
+                    author_id=rng.choice(user_ids), text='Нагрузочный пост'
+                )
+            else:
+                Comment.objects.create(
+                    post_id=rng.choice(post_ids),
+                    author_id=rng.choice(user_ids),
+                    text='Нагрузочный комментарий',
+                )
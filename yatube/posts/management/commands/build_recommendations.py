@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «Кого читать» по графу подписок'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = recommendations.build()
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендаций: {rows}, '
+            f'расчет за {time.monotonic() - started:.1f} с'
+        ))
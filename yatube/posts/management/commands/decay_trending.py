@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Приводит оценки популярных постов к текущему моменту и удаляет '
+        'остывшие; запускается периодически'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Заново посчитать оценки по недавним комментариям'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Популярных постов: {rows}'
+            ))
+            return
+        deleted = trending.decay()
+        self.stdout.write(self.style.SUCCESS(
+            f'Оценки обновлены, удалено остывших постов: {deleted}'
+        ))
@@ -0,0 +1,69 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter, importer
+
+DEFAULT_MODELS = ('posts.post', 'posts.comment', 'posts.follow')
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает модели в сжатый NDJSON по файлу на модель, '
+        'прерванная выгрузка продолжается с контрольной точки. '
+        'Завершенную выгрузку повторяет только --restart'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для выгрузки')
+        parser.add_argument(
+            '--models', nargs='+', default=DEFAULT_MODELS,
+            choices=list(importer.MODELS),
+            help='Модели для выгрузки'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=exporter.CHUNK_SIZE,
+            help='Строк в одной порции'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать выгрузку заново, удалив контрольную точку и '
+                 'файлы выбранных моделей'
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if options['restart']:
+                self._clear(directory, options['models'])
+            checkpoint = exporter.Checkpoint(directory)
+            if all(
+                checkpoint.get(label)['done'] for label in options['models']
+            ):
+                raise CommandError(
+                    f'Выгрузка в {directory} уже завершена, чтобы '
+                    'выгрузить заново, добавьте --restart'
+                )
+            for label in options['models']:
+                started = time.monotonic()
+                rows = exporter.export_model(
+                    label, directory, checkpoint, options['chunk_size']
+                )
+                self.stdout.write(
+                    f'{label}: {rows} строк '
+                    f'({time.monotonic() - started:.1f} с)'
+                )
+        except OSError as error:
+            raise CommandError(f'Не удалось записать выгрузку: {error}')
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка в {directory}'))
+
+    @staticmethod
+    def _clear(directory, labels):
+        names = [exporter.CHECKPOINT]
+        names += [exporter.file_name(label) for label in labels]
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий в кэш лент'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счетчики'
+        )
+
+    def handle(self, *args, **options):
+        for event, value in caching.stats().items():
+            self.stdout.write(f'{event}: {value}')
+        if options['reset']:
+            caching.reset_stats()
@@ -0,0 +1,174 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import importer
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'сегодня вчера город дом утро вечер дорога книга письмо море лес '
+    'река друг работа время жизнь день ночь мысль слово дело голос '
+    'читать писать гулять думать видеть знать ждать говорить ехать '
+    'новый старый долгий тихий светлый важный первый последний '
+    'очень снова опять всегда никогда почти уже еще только'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает синтетических пользователей, группы, посты, комментарии '
+        'и подписки со степенным распределением активности'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--skew', type=float, default=3.0,
+            help='Перекос активности: чем больше, тем сильнее выделяются '
+                 'популярные авторы, группы и посты'
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.skew = options['skew']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        started = time.monotonic()
+        users = self.create_users(options['users'])
+        groups = self.create_groups(options['groups'])
+        posts = self.create_posts(options['posts'], users, groups)
+        self.create_comments(options['comments'], users, posts)
+        self.create_follows(options['follows'], users)
+        generated = time.monotonic()
+        importer.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS(
+            f'Данные созданы за {generated - started:.1f} с, '
+            f'пересчет за {time.monotonic() - generated:.1f} с'
+        ))
+
+    def skewed(self, count):
+        # Степенное распределение: малые номера выпадают чаще
+        return int(count * self.random.random() ** self.skew)
+
+    def text(self, low, high):
+        return ' '.join(
+            self.random.choices(WORDS, k=self.random.randint(low, high))
+        ).capitalize()
+
+    def save(self, model, objects):
+        """Пишет объекты пачками и возвращает pk созданных строк."""
+        last_pk = model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                self._flush(model, batch)
+        self._flush(model, batch)
+        pks = list(model.objects.filter(pk__gt=last_pk).order_by('pk')
+                   .values_list('pk', flat=True))
+        self.stdout.write(f'{model._meta.label}: {len(pks)}')
+        return pks
+
+    @staticmethod
+    def _flush(model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        batch.clear()
+
+    def create_users(self, count):
+        suffix = int(self.now.timestamp())
+        return self.save(User, (
+            User(username=f'user{suffix}_{number}', password='!',
+                 date_joined=self.start)
+            for number in range(count)
+        ))
+
+    def create_groups(self, count):
+        suffix = int(self.now.timestamp())
+        return self.save(Group, (
+            Group(title=f'Группа {number}', slug=f'group{suffix}-{number}',
+                  description=self.text(5, 20))
+            for number in range(count)
+        ))
+
+    def post_date(self, number, count):
+        # Посты идут по времени в порядке создания
+        return self.start + (self.now - self.start) * (number + 1) / count
+
+    def create_posts(self, count, users, groups):
+        def posts():
+            for number in range(count):
+                group = None
+                if groups and self.random.random() < 0.7:
+                    group = groups[self.skewed(len(groups))]
+                pub_date = self.post_date(number, count)
+                yield Post(
+                    author_id=users[self.skewed(len(users))],
+                    group_id=group,
+                    text=self.text(5, 60),
+                    pub_date=pub_date,
+                    updated=pub_date,
+                )
+
+        with importer.KeepDates():
+            return self.save(Post, posts())
+
+    def create_comments(self, count, users, posts):
+        def comments():
+            for _ in range(count):
+                # Обсуждают чаще свежие посты
+                number = len(posts) - 1 - self.skewed(len(posts))
+                pub_date = min(
+                    self.post_date(number, len(posts))
+                    + timedelta(hours=self.random.expovariate(1 / 12)),
+                    self.now,
+                )
+                yield Comment(
+                    post_id=posts[number],
+                    author_id=self.random.choice(users),
+                    text=self.text(2, 20),
+                    pub_date=pub_date,
+                )
+
+        if posts:
+            with importer.KeepDates():
+                self.save(Comment, comments())
+
+    def create_follows(self, average, users):
+        alpha = 1.5
+        scale = average * (alpha - 1) / alpha
+
+        def follows():
+            for user in users:
+                count = min(
+                    len(users) - 1,
+                    int(scale * self.random.paretovariate(alpha)),
+                )
+                authors = set()
+                while len(authors) < count:
+                    author = users[self.skewed(len(users))]
+                    if author != user:
+                        authors.add(author)
+                for author in authors:
+                    yield Follow(user_id=user, author_id=author)
+
+        self.save(Follow, follows())
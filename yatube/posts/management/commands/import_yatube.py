@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает пользователей, группы, посты, комментарии и подписки '
+        'из выгрузки dumpdata пачками через bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSON, можно .gz')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Объектов в одной транзакции'
+        )
+        parser.add_argument(
+            '--ignore-conflicts', action='store_true',
+            help='Пропускать объекты с уже существующими ключами'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(counts):
+            if options['verbosity'] > 1:
+                self.stdout.write(self._rate(counts, started))
+
+        try:
+            with importer.open_dump(options['path']) as stream:
+                counts, skipped = importer.import_objects(
+                    importer.iter_objects(stream),
+                    batch_size=options['batch_size'],
+                    ignore_conflicts=options['ignore_conflicts'],
+                    progress=progress,
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось загрузить выгрузку: {error}')
+        loaded = time.monotonic()
+        importer.rebuild_derived()
+        for label, count in counts.items():
+            self.stdout.write(f'{label}: {count}')
+        for label, count in skipped.items():
+            self.stdout.write(f'{label}: {count} (пропущено)')
+        self.stdout.write(self.style.SUCCESS(
+            f'{self._rate(counts, started, loaded)}, '
+            f'пересчет за {time.monotonic() - loaded:.1f} с'
+        ))
+
+    @staticmethod
+    def _rate(counts, started, finished=None):
+        elapsed = (finished or time.monotonic()) - started
+        total = sum(counts.values())
+        return (
+            f'Загружено объектов: {total} за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):.0f} в секунду)'
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает полнотекстовый индекс постов; после миграции 0010 '
+        'заполняет его впервые'
+    )
+
+    def handle(self, *args, **options):
+        posts = fulltext.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Постов в поисковом индексе: {posts}')
+        )
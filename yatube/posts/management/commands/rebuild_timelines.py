@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import caching, timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из записей Follow'
+
+    def handle(self, *args, **options):
+        entries = timeline.rebuild()
+        caching.invalidate_follow_feeds()
+        self.stdout.write(
+            self.style.SUCCESS(f'Записей в лентах: {entries}')
+        )
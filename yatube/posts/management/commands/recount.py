@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов, подписок и комментариев'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        authors = counters.recount_authors().count()
+        posts = counters.recount_posts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано авторов: {authors}, постов: {posts}'
+        ))
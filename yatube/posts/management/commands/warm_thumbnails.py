@@ -0,0 +1,41 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def warm(name):
+    try:
+        created = thumbnails.generate(name)
+    finally:
+        connections.close_all()
+    return name, created
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры картинок всех постов в несколько процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов (по умолчанию - по числу ядер)'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by().values_list('image', flat=True).distinct()
+        )
+        connections.close_all()
+        created = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for name, is_new in pool.map(warm, names):
+                if is_new:
+                    created += 1
+                    thumbnails.refresh_posts(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, создано миниатюр: {created}'
+        ))
@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    for user in User.objects.annotate(
+        total_posts=Count('posts', distinct=True),
+        total_followers=Count('following', distinct=True),
+        total_following=Count('follower', distinct=True),
+    ):
+        AuthorStats.objects.create(
+            user=user,
+            posts_count=user.total_posts,
+            followers_count=user.total_followers,
+            following_count=user.total_following,
+        )
+    for post in Post.objects.annotate(total=Count('comments')):
+        Post.objects.filter(pk=post.pk).update(comments_count=post.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0007_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+            options={
+                'verbose_name': 'счетчики автора',
+                'verbose_name_plural': 'счетчики авторов',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+TABLE = 'posts_post_fts'
+
+
+def create_index(apps, schema_editor):
+    # Только таблица: стеммер меняется вместе с posts.stemmer, поэтому
+    # индекс заполняет команда rebuild_search тем же кодом, что и поиск
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+        "text, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
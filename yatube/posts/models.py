@@ -17,6 +17,11 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(help_text='Текст поста', verbose_name='')
     pub_date = models.DateTimeField(
@@ -24,6 +29,7 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,12 +50,30 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'posts'
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = [
+            # id в конце индекса совпадает с порядком ключа KeysetPaginator
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -73,6 +97,13 @@ class Comment(models.Model):
         verbose_name='Автор'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'], name='comment_post_date_idx'
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -92,8 +123,120 @@ class Follow(models.Model):
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_pairs'
             )
         ]
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'счетчики автора'
+        verbose_name_plural = 'счетчики авторов'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-id'],
+                name='timeline_user_date_id_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            )
+        ]
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='Читатель'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ('rank',)
+        verbose_name = 'рекомендация'
+        verbose_name_plural = 'рекомендации'
+        indexes = [
+            models.Index(
+                fields=['user', 'rank'], name='recommendation_user_rank_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_recommendation'
+            )
+        ]
+
+
+class TrendingScore(models.Model):
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    # Сумма весов комментариев на момент epoch, у всех строк он общий
+    score = models.FloatField('Оценка', default=0)
+    epoch = models.DateTimeField('Приведено к моменту')
+
+    class Meta:
+        verbose_name = 'оценка популярности'
+        verbose_name_plural = 'оценки популярности'
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.post_id)
@@ -0,0 +1,172 @@
+"""Рекомендации «Кого читать», пересчитываемые пакетно.
+
+Подписки и посты в группах загружаются в разреженные матрицы CSR
+на массивах array: по 8 байт на связь вместо объектов Python.
+Оценка кандидата складывается из двух сигналов:
+
+* подписки подписок - на кого подписаны авторы, которых читает
+  пользователь; вклад автора с множеством подписок меньше;
+* общие группы - активные авторы групп, в которых пишет сам
+  пользователь и авторы, которых он читает.
+"""
+import heapq
+import math
+from array import array
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from . import caching
+from .models import Follow, Post, Recommendation, User
+
+# Вес сигнала общих групп относительно подписок подписок
+GROUP_WEIGHT = 0.5
+# Сколько самых активных авторов группы участвуют в рекомендациях
+GROUP_AUTHORS = 50
+# Сколько строк таблицы держать в памяти при записи
+WRITE_CHUNK = 10000
+
+
+class CSR:
+    """Разреженная матрица: столбцы и значения строки i лежат
+    в indices и data с indptr[i] по indptr[i + 1]."""
+
+    def __init__(self, size, items):
+        # items - тройки (строка, столбец, значение) по возрастанию строк
+        self.indptr = array('q', bytes(8 * (size + 1)))
+        self.indices = array('q')
+        self.data = array('d')
+        for row, column, value in items:
+            self.indptr[row + 1] += 1
+            self.indices.append(column)
+            self.data.append(value)
+        for row in range(size):
+            self.indptr[row + 1] += self.indptr[row]
+
+    def columns(self, row):
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def row(self, row):
+        start, end = self.indptr[row], self.indptr[row + 1]
+        return zip(self.indices[start:end], self.data[start:end])
+
+    def length(self, row):
+        return self.indptr[row + 1] - self.indptr[row]
+
+    def sums(self):
+        return array('d', (
+            sum(self.data[self.indptr[row]:self.indptr[row + 1]])
+            for row in range(len(self.indptr) - 1)
+        ))
+
+
+def load(users):
+    # Пользователи, подписки и посты, появившиеся после чтения списка
+    # users, пропускаются: они попадут в следующий пересчет
+    index = {pk: row for row, pk in enumerate(users)}
+    follows = CSR(len(users), (
+        (index[user_id], index[author_id], 1.0)
+        for user_id, author_id in Follow.objects.filter(
+            user__isnull=False, author__isnull=False
+        ).order_by('user_id', 'author_id').values_list(
+            'user_id', 'author_id'
+        ).iterator()
+        if user_id in index and author_id in index
+    ))
+    counts = Post.objects.filter(group__isnull=False).order_by(
+        'author_id'
+    ).values_list('author_id', 'group_id').annotate(posts=Count('id'))
+    groups = CSR(len(users), (
+        (index[author_id], group_id, posts)
+        for author_id, group_id, posts in counts.iterator()
+        if author_id in index
+    ))
+    return follows, groups
+
+
+def group_authors(groups):
+    """Самые активные авторы каждой группы и их доля постов в ней."""
+    authors = defaultdict(list)
+    for row in range(len(groups.indptr) - 1):
+        for group_id, posts in groups.row(row):
+            authors[group_id].append((posts, row))
+    top = {}
+    for group_id, counts in authors.items():
+        total = sum(posts for posts, _ in counts)
+        top[group_id] = [
+            (row, posts / total)
+            for posts, row in heapq.nlargest(GROUP_AUTHORS, counts)
+        ]
+    return top
+
+
+def score(row, follows, groups, group_sums, top_authors):
+    scores = defaultdict(float)
+    followed = follows.columns(row)
+    for author in followed:
+        weight = 1 / math.log2(2 + follows.length(author))
+        for candidate in follows.columns(author):
+            scores[candidate] += weight
+    affinity = defaultdict(float)
+    for member, share in [(row, 1.0)] + [
+        (author, 1 / len(followed)) for author in followed
+    ]:
+        for group_id, posts in groups.row(member):
+            affinity[group_id] += share * posts / group_sums[member]
+    for group_id, weight in affinity.items():
+        for candidate, share in top_authors[group_id]:
+            scores[candidate] += GROUP_WEIGHT * weight * share
+    scores.pop(row, None)
+    for author in followed:
+        scores.pop(author, None)
+    return heapq.nlargest(
+        settings.RECOMMENDATIONS_COUNT, scores.items(),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+def build():
+    """Пересчитывает таблицу рекомендаций и возвращает число строк."""
+    users = array('q', User.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ))
+    follows, groups = load(users)
+    group_sums = groups.sums()
+    top_authors = group_authors(groups)
+    # Расчет идет до транзакции, чтобы не держать блокировку записи
+    rows, candidates, values = array('q'), array('q'), array('d')
+    ranks = array('h')
+    for row in range(len(users)):
+        top = score(row, follows, groups, group_sums, top_authors)
+        for rank, (candidate, value) in enumerate(top, 1):
+            rows.append(row)
+            candidates.append(candidate)
+            values.append(value)
+            ranks.append(rank)
+    recommendations = (
+        Recommendation(
+            user_id=users[rows[item]], author_id=users[candidates[item]],
+            score=values[item], rank=ranks[item],
+        )
+        for item in range(len(rows))
+    )
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        while True:
+            chunk = list(islice(recommendations, WRITE_CHUNK))
+            if not chunk:
+                break
+            Recommendation.objects.bulk_create(chunk)
+    caching.invalidate(caching.RECOMMENDATIONS_SCOPE)
+    return len(rows)
+
+
+def for_user(user):
+    if not user.is_authenticated:
+        return []
+    return user.recommendations.select_related('author')[
+        :settings.RECOMMENDATIONS_ON_PAGE
+    ]
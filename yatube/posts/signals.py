@@ -0,0 +1,150 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, counters, fulltext, thumbnails, timeline, trending
+from .models import (
+    AuthorStats, Comment, Follow, Group, Post, Recommendation, User
+)
+
+
+def touch_posts(posts, *scopes):
+    """Сдвигает время изменения постов, чтобы перерисовались их
+    карточки, и сбрасывает страницы, на которых они показаны."""
+    posts = posts.order_by()
+    authors = set(posts.values_list('author_id', flat=True))
+    groups = set(posts.values_list('group_id', flat=True)) - {None}
+    followers = Follow.objects.filter(
+        author_id__in=authors
+    ).values_list('user_id', flat=True).distinct()
+    caching.invalidate(
+        caching.INDEX_SCOPE,
+        *scopes,
+        *(caching.group_scope(pk) for pk in groups),
+        *(caching.profile_scope(pk) for pk in authors),
+        *(caching.follow_scope(pk) for pk in followers),
+    )
+    posts.update(updated=timezone.now())
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw, update_fields, **kwargs):
+    # Вход сохраняет только last_login, имя при этом не меняется
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    if instance.pk and not raw:
+        instance.previous_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+    previous = getattr(instance, 'previous_username', None)
+    if previous is not None and previous != instance.username:
+        # Имя автора и ссылка на профиль есть в карточках его постов
+        touch_posts(
+            Post.objects.filter(author=instance),
+            caching.profile_scope(instance.pk),
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw, **kwargs):
+    if raw and instance.updated is None:
+        # В старых выгрузках для loaddata нет даты изменения
+        instance.updated = timezone.now()
+    if instance.pk and not raw:
+        instance.previous_group_id = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_author(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    if instance.image and not raw:
+        thumbnails.schedule(instance.image)
+    fulltext.index_post(instance)
+    previous_group_id = getattr(instance, 'previous_group_id', None)
+    caching.invalidate(*caching.post_scopes(instance, [previous_group_id]))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, 'posts_count', -1)
+    fulltext.unindex_post(instance.pk)
+    caching.invalidate(*caching.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw and instance.post_id:
+        counters.change_post(instance.post_id, 1)
+        trending.record_comment(instance)
+    caching.invalidate(caching.post_scope(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id:
+        counters.change_post(instance.post_id, -1)
+        trending.forget_comment(instance)
+    caching.invalidate(caching.post_scope(instance.post_id))
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance.previous_link = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('title', 'slug').first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    previous = getattr(instance, 'previous_link', None)
+    if previous is not None and previous != (instance.title, instance.slug):
+        # Название и ссылка на группу есть в карточках ее постов
+        touch_posts(Post.objects.filter(group=instance))
+    caching.invalidate(caching.group_scope(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    touch_posts(Post.objects.filter(group=instance))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_author(instance.author_id, 'followers_count', 1)
+        counters.change_author(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+    Recommendation.objects.filter(
+        user_id=instance.user_id, author_id=instance.author_id
+    ).delete()
+    caching.invalidate(
+        caching.follow_scope(instance.user_id),
+        caching.profile_scope(instance.author_id),
+        caching.profile_scope(instance.user_id),
+        caching.recommendations_scope(instance.user_id),
+    )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, 'followers_count', -1)
+    counters.change_author(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    caching.invalidate(
+        caching.follow_scope(instance.user_id),
+        caching.profile_scope(instance.author_id),
+        caching.profile_scope(instance.user_id),
+    )
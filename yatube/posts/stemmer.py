@@ -0,0 +1,117 @@
+"""Стеммер Snowball для русского языка.
+
+https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+
+
+def _endings(after_a, other):
+    # Окончания первой группы допустимы только после «а» или «я»
+    endings = [(ending, True) for ending in after_a]
+    endings += [(ending, False) for ending in other]
+    return sorted(endings, key=lambda item: -len(item[0]))
+
+
+PERFECTIVE_GERUND = _endings(
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _endings((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = _endings(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = _endings((), ('ся', 'сь'))
+VERB = _endings(
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = _endings((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = _endings((), ('ейше', 'ейш'))
+DERIVATIONAL = _endings((), ('ость', 'ост'))
+
+
+def _after_vowel_consonant(word, start):
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, region, endings):
+    for ending, after_a in endings:
+        if not word.endswith(ending):
+            continue
+        start = len(word) - len(ending)
+        if start < region:
+            continue
+        if after_a and (start - 1 < region or word[start - 1] not in 'ая'):
+            continue
+        return word[:start], True
+    return word, False
+
+
+def _step_1(word, rv):
+    word, removed = _remove(word, rv, PERFECTIVE_GERUND)
+    if removed:
+        return word
+    word, _ = _remove(word, rv, REFLEXIVE)
+    word, removed = _remove(word, rv, ADJECTIVE)
+    if removed:
+        return _remove(word, rv, PARTICIPLE)[0]
+    word, removed = _remove(word, rv, VERB)
+    if removed:
+        return word
+    return _remove(word, rv, NOUN)[0]
+
+
+def _step_4(word, rv):
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    word, removed = _remove(word, rv, SUPERLATIVE)
+    if removed:
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+        return word
+    if word.endswith('ь') and len(word) - 1 >= rv:
+        return word[:-1]
+    return word
+
+
+# Словарь текстов невелик по сравнению с числом словоупотреблений
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r2 = _after_vowel_consonant(word, _after_vowel_consonant(word, 0))
+    word = _step_1(word, rv)
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _remove(word, r2, DERIVATIONAL)[0]
+    return _step_4(word, rv)
+
+
+def stem_text(text):
+    return ' '.join(stem(word) for word in WORD.findall(text))
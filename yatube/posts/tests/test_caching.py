@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import caching
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(FEED_CACHE_BETA=0)
+class TestStampedeProtection(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        cache.clear()
+
+    def test_hit_and_miss_are_counted(self):
+        """Первый запрос главной - промах, следующий - попадание."""
+        self.guest_client.get(reverse('posts:main_page'))
+        self.guest_client.get(reverse('posts:main_page'))
+        self.assertEqual(
+            caching.stats(),
+            {'hit': 1, 'miss': 1, 'stale': 0, 'recompute': 0},
+        )
+
+    def test_stale_value_is_served_while_locked(self):
+        """Пока другой запрос пересчитывает запись, отдается прежнее
+        значение, а пересчет выполняет только владелец блокировки."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(
+            caching.get_or_compute('key', 1, compute, timeout=-1), 1
+        )
+        cache.add(caching.LOCK_KEY.format('key'), 1)
+        self.assertEqual(caching.get_or_compute('key', 1, compute), 1)
+        self.assertEqual(caching.stats()['stale'], 1)
+        cache.delete(caching.LOCK_KEY.format('key'))
+        self.assertEqual(caching.get_or_compute('key', 1, compute), 2)
+        self.assertEqual(caching.stats()['recompute'], 1)
+        self.assertEqual(len(calls), 2)
+
+    @override_settings(FEED_CACHE_LOCK_WAIT=0)
+    def test_invalidated_value_is_not_served(self):
+        """Запись, сброшенная сменой версии, не отдается даже во время
+        чужого пересчета, а чужая блокировка не снимается."""
+        caching.get_or_compute('key', 1, lambda: 'old')
+        cache.add(caching.LOCK_KEY.format('key'), 1)
+        self.assertEqual(
+            caching.get_or_compute('key', 2, lambda: 'new'), 'new'
+        )
+        self.assertEqual(caching.stats()['stale'], 0)
+        self.assertIsNotNone(cache.get(caching.LOCK_KEY.format('key')))
+
+    def test_expired_value_is_recomputed(self):
+        """Запись с истекшим сроком пересчитывается."""
+        caching.get_or_compute('key', 1, lambda: 'old', timeout=-1)
+        self.assertEqual(
+            caching.get_or_compute('key', 1, lambda: 'new'), 'new'
+        )
+
+    def test_reset_stats(self):
+        """Счетчики обнуляются."""
+        self.guest_client.get(reverse('posts:main_page'))
+        caching.reset_stats()
+        self.assertEqual(caching.stats()['miss'], 0)
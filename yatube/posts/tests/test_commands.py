@@ -0,0 +1,194 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .. import exporter, importer
+from ..fulltext import SearchResults
+from ..models import AuthorStats, Comment, Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ImportCommandTest(TestCase):
+    DUMP = [
+        {'model': 'auth.user', 'pk': 10, 'fields': {
+            'username': 'leo', 'password': 'x', 'groups': [],
+            'date_joined': '2019-10-05T21:37:36.487Z',
+        }},
+        {'model': 'auth.user', 'pk': 11, 'fields': {
+            'username': 'reader', 'password': 'x',
+            'date_joined': '2019-10-05T21:37:36.487Z',
+        }},
+        {'model': 'sessions.session', 'pk': 'abc', 'fields': {}},
+        {'model': 'posts.group', 'pk': 3, 'fields': {
+            'title': 'Дневник', 'slug': 'diary', 'description': 'Записи',
+        }},
+        {'model': 'posts.post', 'pk': 7, 'fields': {
+            'text': 'Начинаю новую тетрадь дневника',
+            'pub_date': '1854-03-14T00:00:00Z', 'author': 10, 'group': 3,
+        }},
+        {'model': 'posts.comment', 'pk': 1, 'fields': {
+            'text': 'Комментарий', 'pub_date': '2019-10-06T00:00:00Z',
+            'author': 11, 'post': 7,
+        }},
+        {'model': 'posts.follow', 'pk': 1, 'fields': {
+            'user': 11, 'author': 10,
+        }},
+    ]
+
+    def import_dump(self, content):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.json', encoding='utf-8', delete=False
+        ) as dump:
+            dump.write(content)
+        self.addCleanup(os.remove, dump.name)
+        call_command('import_yatube', dump.name, stdout=StringIO())
+
+    def test_import_keeps_data_and_rebuilds_derived(self):
+        """Импорт сохраняет даты и пересобирает счетчики, ленты и поиск."""
+        self.import_dump(json.dumps(self.DUMP, indent=4))
+        post = Post.objects.get(pk=7)
+        self.assertEqual(
+            post.pub_date, datetime(1854, 3, 14, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.group.slug, 'diary')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(AuthorStats.objects.get(pk=10).posts_count, 1)
+        self.assertEqual(AuthorStats.objects.get(pk=10).followers_count, 1)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user_id=11, post=post).exists()
+        )
+        self.assertEqual(SearchResults('тетради').count(), 1)
+        new_post = Post.objects.create(author_id=10, text='Новый пост')
+        self.assertGreater(new_post.pk, post.pk)
+
+    def test_stream_parsing(self):
+        """Объекты читаются по частям из массива и из JSON по строкам."""
+        dumps = (
+            json.dumps(self.DUMP, ensure_ascii=False),
+            '\n'.join(json.dumps(obj) for obj in self.DUMP),
+        )
+        for content in dumps:
+            with self.subTest(content=content[:20]):
+                objects = importer.iter_objects(StringIO(content),
+                                                read_size=16)
+                self.assertEqual(list(objects), self.DUMP)
+
+
+class ExportCommandTest(TestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='auth')
+        for i in range(5):
+            Post.objects.create(author=author, text=f'Пост {i}')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(
+            self.directory, exporter.file_name('posts.post')
+        )
+
+    def export(self, *args):
+        call_command('export_yatube', self.directory, '--models',
+                     'posts.post', '--chunk-size', '2', *args,
+                     stdout=StringIO())
+
+    def exported_pks(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as dump:
+            return [record['pk'] for record in importer.iter_objects(dump)]
+
+    def test_interrupted_export_resumes(self):
+        """Прерванная выгрузка продолжается с контрольной точки без
+        повторов и без недописанной порции."""
+        save = exporter.Checkpoint.save
+
+        def interrupt(checkpoint, label, **values):
+            save(checkpoint, label, **values)
+            raise RuntimeError('Сбой')
+
+        with mock.patch.object(exporter.Checkpoint, 'save', interrupt):
+            with self.assertRaises(RuntimeError):
+                self.export()
+        with open(self.path, 'ab') as dump:
+            dump.write(b'\x1f\x8b-broken-chunk')
+        self.export()
+        self.assertEqual(
+            self.exported_pks(),
+            list(Post.objects.order_by('pk').values_list('pk', flat=True)),
+        )
+
+    def test_finished_export_needs_restart(self):
+        """Повторная выгрузка в завершенный каталог - ошибка, с
+        --restart выгрузка начинается заново."""
+        self.export()
+        post = Post.objects.create(author=Post.objects.first().author,
+                                   text='Новый пост')
+        with self.assertRaisesMessage(CommandError, '--restart'):
+            self.export()
+        self.assertNotIn(post.pk, self.exported_pks())
+        self.export('--restart')
+        self.assertEqual(
+            self.exported_pks(),
+            list(Post.objects.order_by('pk').values_list('pk', flat=True)),
+        )
+
+
+class BenchmarkCommandsTest(TestCase):
+    def test_generate_data_and_benchmark(self):
+        """Генератор создает связанные данные, а замеры пишут отчет
+        по каждой странице."""
+        call_command(
+            'generate_data', '--users', '20', '--groups', '3', '--posts',
+            '100', '--comments', '50', '--follows', '3', '--seed', '1',
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            100,
+        )
+        self.assertEqual(TimelineEntry.objects.count(), sum(
+            Post.objects.filter(author_id=author_id).count()
+            for author_id in Follow.objects.values_list(
+                'author_id', flat=True
+            )
+        ))
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark', '--requests', '2', '--output', output,
+                         stdout=StringIO())
+            with open(output, encoding='utf-8') as report:
+                results = json.load(report)['results']
+        self.assertIn('follow_index', results)
+        for name, result in results.items():
+            with self.subTest(name=name):
+                self.assertGreater(result['cold']['queries'], 0)
+                self.assertIn('p99_ms', result['warm'])
+
+    def test_sqlite_benchmark_worker(self):
+        """Процесс нагрузки читает и пишет посты и комментарии и
+        отдает замеры в JSON."""
+        author = User.objects.create_user(username='auth')
+        Post.objects.create(author=author, text='Пост')
+        output = StringIO()
+        call_command(
+            'benchmark_sqlite', '--worker', '--duration', '0.2',
+            '--write-ratio', '0.5', stdout=output,
+        )
+        result = json.loads(output.getvalue())
+        self.assertEqual(result['errors'], 0)
+        self.assertTrue(result['read_ms'])
+        self.assertTrue(result['write_ms'])
+        self.assertEqual(
+            Comment.objects.count() + Post.objects.count() - 1,
+            len(result['write_ms']),
+        )
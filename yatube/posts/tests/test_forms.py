@@ -1,12 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.conf import settings
+from PIL import Image
 
+from ..forms import PostForm
 from ..models import Post, Group
 
 User = get_user_model()
@@ -100,3 +103,52 @@ class TestViewPosts(TestCase):
         self.assertEqual(edited_post.group.id, form_data['group'])
         self.assertEqual(edited_post.author, self.author)
         self.assertEqual(Post.objects.count(), posts_count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestPostFormImage(TestCase):
+    @staticmethod
+    def get_image(size=(300, 200), mode='RGB', exif=None):
+        output = BytesIO()
+        image = Image.new(mode, size, 'red')
+        if exif is not None:
+            image.save(output, 'JPEG', exif=exif)
+        else:
+            image.save(output, 'PNG')
+        return SimpleUploadedFile('photo.png', output.getvalue())
+
+    def get_form(self, image):
+        return PostForm(data={'text': 'Текст'}, files={'image': image})
+
+    def test_image_is_normalized(self):
+        """Картинка перекодируется в JPEG, уменьшается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        with self.settings(POST_IMAGE_MAX_SIDE=100):
+            form = self.get_form(self.get_image(exif=exif.tobytes()))
+            self.assertTrue(form.is_valid())
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'photo.jpg')
+        saved = Image.open(image)
+        self.assertEqual(saved.format, 'JPEG')
+        self.assertEqual(saved.size, (100, 67))
+        self.assertNotIn('exif', saved.info)
+
+    def test_transparent_image_is_accepted(self):
+        """Картинка с прозрачностью переводится в RGB."""
+        form = self.get_form(self.get_image(mode='RGBA'))
+        self.assertTrue(form.is_valid())
+        self.assertEqual(Image.open(form.cleaned_data['image']).mode, 'RGB')
+
+    def test_limits(self):
+        """Слишком тяжелые и слишком большие картинки отклоняются."""
+        limits = {
+            'POST_IMAGE_MAX_BYTES': 100,
+            'POST_IMAGE_MAX_PIXELS': 300 * 200 - 1,
+        }
+        for setting, value in limits.items():
+            with self.subTest(setting=setting):
+                with self.settings(**{setting: value}):
+                    form = self.get_form(self.get_image())
+                    self.assertFalse(form.is_valid())
+                self.assertIn('image', form.errors)
@@ -1,7 +1,16 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone as django_timezone
 
-from ..models import Group, Post
+from .. import importer, trending
+from ..models import (
+    AuthorStats, Comment, Follow, Group, Post, TimelineEntry, TrendingScore
+)
 
 User = get_user_model()
 
@@ -59,3 +68,175 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     post._meta.get_field(field).verbose_name, expected_value
                 )
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост автора',
+        )
+
+    def timeline(self):
+        return list(self.reader.timeline.values_list('post_id', flat=True))
+
+    def test_follow_fills_and_unfollow_prunes_timeline(self):
+        """Подписка дополняет ленту постами автора, новые посты
+        раздаются подписчикам, отписка очищает ленту."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.timeline(), [self.post.id])
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.timeline(), [new_post.id, self.post.id])
+        follow.delete()
+        self.assertEqual(self.timeline(), [])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты из подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline(), [self.post.id])
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счетчики постов, подписок и комментариев обновляются при
+        создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        comment = Comment.objects.create(
+            author=self.reader, text='Комментарий', post=post
+        )
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_recount_command(self):
+        """Команда recount исправляет рассинхронизацию счетчиков."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(author=self.reader, text='Текст', post=post)
+        AuthorStats.objects.all().delete()
+        Post.objects.update(comments_count=5)
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+
+
+@override_settings(TRENDING_HALF_LIFE=3600, TRENDING_MIN_SCORE=0.6)
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.busy = Post.objects.create(author=cls.author, text='Обсуждаемый')
+        cls.quiet = Post.objects.create(author=cls.author, text='Тихий')
+
+    def comment(self, post):
+        return Comment.objects.create(
+            author=self.author, text='Комментарий', post=post
+        )
+
+    def scores(self):
+        return dict(TrendingScore.objects.values_list('post_id', 'score'))
+
+    def test_comments_increase_score(self):
+        """Каждый комментарий увеличивает оценку поста."""
+        self.comment(self.busy)
+        self.comment(self.busy)
+        self.comment(self.quiet)
+        self.assertEqual(trending.top_ids(), [self.busy.pk, self.quiet.pk])
+        scores = self.scores()
+        self.assertAlmostEqual(scores[self.busy.pk], 2, places=2)
+        self.assertAlmostEqual(scores[self.quiet.pk], 1, places=2)
+
+    def test_decay_command(self):
+        """Затухание уменьшает оценки вдвое за полупериод и удаляет
+        остывшие посты."""
+        self.comment(self.busy)
+        self.comment(self.busy)
+        self.comment(self.quiet)
+        later = django_timezone.now() + timedelta(hours=1)
+        with mock.patch('posts.trending.timezone.now', return_value=later):
+            call_command('decay_trending', stdout=StringIO())
+            self.comment(self.busy)
+        scores = self.scores()
+        self.assertEqual(list(scores), [self.busy.pk])
+        self.assertAlmostEqual(scores[self.busy.pk], 1 + 1, places=2)
+        self.assertEqual(
+            set(TrendingScore.objects.values_list('epoch', flat=True)),
+            {later},
+        )
+
+    def test_rebuild_prefers_recent_comments(self):
+        """Пересчет по комментариям учитывает их возраст."""
+        self.comment(self.busy)
+        self.comment(self.busy)
+        Comment.objects.update(
+            pub_date=django_timezone.now() - timedelta(hours=2)
+        )
+        self.comment(self.quiet)
+        call_command('decay_trending', '--rebuild', stdout=StringIO())
+        self.assertEqual(trending.top_ids(), [self.quiet.pk])
+        self.assertAlmostEqual(self.scores()[self.quiet.pk], 1, places=2)
+
+    def test_deleted_comment_lowers_score(self):
+        """Удаление комментария снимает его вес, а пост без свежих
+        комментариев уходит из популярных."""
+        first = self.comment(self.busy)
+        self.comment(self.busy)
+        last = self.comment(self.quiet)
+        first.delete()
+        self.assertAlmostEqual(self.scores()[self.busy.pk], 1, places=2)
+        last.delete()
+        self.assertNotIn(self.quiet.pk, self.scores())
+
+    def test_derived_data_rebuild_fills_trending(self):
+        """Пересборка после загрузки без сигналов заполняет популярные."""
+        Comment.objects.bulk_create([
+            Comment(author=self.author, text='Загружен', post=self.quiet)
+        ])
+        self.assertEqual(trending.top_ids(), [])
+        importer.rebuild_derived()
+        self.assertEqual(trending.top_ids(), [self.quiet.pk])
+
+    def test_old_epoch_is_rebased_on_comment(self):
+        """Без запусков decay новый комментарий сам переносит epoch,
+        и вес не переполняется."""
+        self.comment(self.quiet)
+        TrendingScore.objects.update(
+            epoch=django_timezone.now() - timedelta(days=400)
+        )
+        comment = self.comment(self.busy)
+        scores = self.scores()
+        self.assertAlmostEqual(scores[self.busy.pk], 1, places=2)
+        self.assertAlmostEqual(scores[self.quiet.pk], 0)
+        self.assertEqual(
+            set(TrendingScore.objects.values_list('epoch', flat=True)),
+            {comment.pub_date},
+        )
+        call_command('decay_trending', stdout=StringIO())
+        self.assertEqual(trending.top_ids(), [self.busy.pk])
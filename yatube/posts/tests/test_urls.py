@@ -40,6 +40,8 @@ class PostsURLTests(TestCase):
             self.guest_client.get(f'/group/{self.group.slug}/'): HTTPStatus.OK,
             self.guest_client.get(f'/profile/{self.user}/'): HTTPStatus.OK,
             self.guest_client.get(f'/posts/{self.post.id}/'): HTTPStatus.OK,
+            self.guest_client.get(
+                f'/posts/{self.post.id}/comments/'): HTTPStatus.OK,
             self.authorized_client.get('/create/'): HTTPStatus.OK,
             self.post_author.get(
                 f'/posts/{self.post.id}/edit/'): HTTPStatus.OK,
@@ -1,11 +1,27 @@
+import shutil
+import tempfile
+import time
+from array import array
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, TransactionTestCase
+from django.test import override_settings
 from django.urls import reverse
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Task
 
-from ..models import Post, Group, Comment, Follow
+from .. import caching, recommendations, thumbnails
+from ..models import Post, Group, Comment, Follow, Recommendation
+from ..utils import NEXT, KeysetPaginator
 
 User = get_user_model()
 
@@ -46,15 +62,38 @@ class TestViewPosts(TestCase):
         cache.clear()
 
     def test_cache_is_working(self):
-        """Тестируем работу кэша."""
+        """Тестируем работу кэша карточек постов."""
         response = self.authorized_client.get(reverse('posts:main_page'))
-        Post.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
         response_1 = self.authorized_client.get(reverse('posts:main_page'))
         cache.clear()
         response_2 = self.authorized_client.get(reverse('posts:main_page'))
         self.assertEqual(response.content, response_1.content)
         self.assertNotEqual(response_1.content, response_2.content)
 
+    def test_cached_cards_are_shared_between_pages_and_users(self):
+        """Карточка поста берется из кэша на других страницах и
+        у других пользователей, а шапка отрисовывается заново."""
+        cache.clear()
+        self.authorized_client.get(reverse('posts:main_page'))
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        response = self.post_author.get(
+            reverse('posts:profile', kwargs={'username': self.author})
+        )
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'Новый текст')
+        self.assertContains(response, f'Пользователь: {self.author}')
+
+    def test_edited_post_card_is_refreshed(self):
+        """После сохранения поста карточка отрисовывается заново."""
+        cache.clear()
+        self.authorized_client.get(reverse('posts:main_page'))
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:main_page'))
+        self.assertContains(response, 'Отредактированный текст')
+
     def test_templates_users(self):
         """Тестируем соответствие шаблонов, вызываемых view-функциями
         (используется учетная запись автора поста)."""
@@ -249,3 +288,611 @@ class TestPaginator(TestCase):
         for response, value in response_values.items():
             with self.subTest(response=response):
                 self.assertEqual(len(response.context['page_obj']), value)
+
+
+class TestKeysetPaginator(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            [Post(
+                author=self.author,
+                text=f'Тестовый текст №{i}',
+                group=self.group,
+            ) for i in range(POST_CREATE)]
+        )
+        cache.clear()
+
+    def test_keyset_pages(self):
+        """Тестируем переход по курсорам вперед и назад на страницах
+        ленты без OFFSET."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                first_page = self.guest_client.get(
+                    url + '?cursor=').context['page_obj']
+                self.assertEqual(len(first_page), settings.POSTS_ON_PAGE)
+                self.assertFalse(first_page.has_previous())
+                with CaptureQueriesContext(connection) as queries:
+                    second_page = self.guest_client.get(
+                        url + f'?cursor={first_page.next_cursor}'
+                    ).context['page_obj']
+                self.assertFalse(any(
+                    'OFFSET' in query['sql'] for query in queries
+                ))
+                self.assertEqual(len(second_page), POSTS_ON_2ND_PAGE)
+                self.assertFalse(second_page.has_next())
+                previous_page = self.guest_client.get(
+                    url + f'?cursor={second_page.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(
+                    list(previous_page.object_list),
+                    list(first_page.object_list),
+                )
+
+    def test_keyset_mode_from_settings(self):
+        """Режим курсоров включается настройкой PAGINATION_MODE."""
+        with self.settings(PAGINATION_MODE='keyset'):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.guest_client.get(reverse('posts:main_page'))
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.is_keyset)
+        self.assertContains(response, f'?cursor={page_obj.next_cursor}')
+
+
+class TestFeedQueries(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Первый пост',
+            group=self.group,
+        )
+        Comment.objects.create(
+            author=self.reader, text='Комментарий', post=self.post
+        )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Количество запросов на страницах ленты и поста не зависит
+        от числа постов и комментариев на странице."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:follow_index'),
+            reverse('posts:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        single = {url: self.count_queries(url) for url in urls}
+        for i in range(settings.POSTS_ON_PAGE):
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group_{i}', description='-'
+            )
+            Post.objects.create(author=self.author, text=f'Пост {i}',
+                                group=group)
+            commentator = User.objects.create_user(username=f'user_{i}')
+            Comment.objects.create(
+                author=commentator, text=f'Комментарий {i}', post=self.post
+            )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+
+
+class TestFeedInvalidation(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Описание другой группы',
+        )
+        Post.objects.create(author=self.author, text='Старый пост',
+                            group=self.group)
+        cache.clear()
+
+    def test_new_post_is_shown_on_cached_pages(self):
+        """Новый пост сразу появляется на закэшированных страницах."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:follow_index'),
+            reverse('posts:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in urls:
+            self.reader_client.get(url)
+        post = Post.objects.create(author=self.author, text='Новый пост',
+                                   group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.reader_client.get(url)
+                self.assertIn(post, response.context['page_obj'])
+
+    def test_only_affected_scopes_are_invalidated(self):
+        """Пост в одной группе не сбрасывает кэш другой группы."""
+        other_scope = caching.group_scope(self.other_group.pk)
+        version = caching.scope_version(other_scope)
+        index_version = caching.scope_version(caching.INDEX_SCOPE)
+        Post.objects.create(author=self.author, text='Новый пост',
+                            group=self.group)
+        self.assertEqual(caching.scope_version(other_scope), version)
+        self.assertNotEqual(
+            caching.scope_version(caching.INDEX_SCOPE), index_version
+        )
+
+    def test_moved_post_leaves_old_group_page(self):
+        """Пост, перенесенный в другую группу, пропадает со страницы
+        прежней группы."""
+        url = reverse('posts:group_list', kwargs={'any_slug': self.group.slug})
+        self.reader_client.get(url)
+        post = Post.objects.get()
+        post.group = self.other_group
+        post.save()
+        response = self.reader_client.get(url)
+        self.assertNotIn(post, response.context['page_obj'])
+
+    def test_renamed_group_and_author_refresh_cards(self):
+        """Карточки постов перерисовываются после смены адреса группы
+        и имени автора."""
+        url = reverse('posts:main_page')
+        self.reader_client.get(url)
+        self.group.slug = 'new_slug'
+        self.group.save()
+        self.author.username = 'renamed'
+        self.author.save()
+        response = self.reader_client.get(url)
+        self.assertContains(
+            response, reverse('posts:group_list', args=['new_slug'])
+        )
+        self.assertContains(
+            response, reverse('posts:profile', args=['renamed'])
+        )
+
+
+class TestInvalidationAfterCommit(TransactionTestCase):
+    def test_versions_change_again_after_commit(self):
+        """Версия области меняется еще раз после коммита, поэтому
+        страница, собранная до коммита, не остается в кэше."""
+        author = User.objects.create_user(username='auth')
+        with transaction.atomic():
+            Post.objects.create(author=author, text='Пост')
+            version = caching.scope_version(caching.INDEX_SCOPE)
+        self.assertNotEqual(
+            caching.scope_version(caching.INDEX_SCOPE), version
+        )
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class TestDeferredThumbnails(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', small_gif, 'image/gif'),
+        )
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюра не создана, на странице выводится заглушка,
+        после создания - картинка."""
+        response = self.guest_client.get(reverse('posts:main_page'))
+        self.assertNotContains(response, '<img class="card-img')
+        self.assertContains(response, 'bg-light')
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        thumbnails.refresh_posts(self.post.image.name)
+        response = self.guest_client.get(reverse('posts:main_page'))
+        self.assertContains(response, '<img class="card-img')
+        self.assertFalse(thumbnails.generate(self.post.image.name))
+
+    def test_rendering_does_not_enqueue_thumbnails(self):
+        """Просмотр поста без готовой миниатюры ничего не пишет
+        в очередь задач."""
+        Task.objects.all().delete()
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(url)
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith(('INSERT', 'UPDATE'))
+        ])
+
+
+class TestSearch(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        self.url = reverse('posts:search')
+
+    def search(self, query, **params):
+        response = self.guest_client.get(self.url, {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_finds_other_word_forms(self):
+        """Поиск находит пост по другой форме слова."""
+        post = Post.objects.create(author=self.author,
+                                   text='Вчера мы гуляли в парке')
+        Post.objects.create(author=self.author, text='Сегодня идет дождь')
+        self.assertEqual(self.search('гулять'), [post])
+        self.assertEqual(self.search('Парк'), [post])
+
+    def test_more_relevant_posts_go_first(self):
+        """Посты, где слово встречается чаще, выводятся выше."""
+        rare = Post.objects.create(
+            author=self.author,
+            text='Длинный рассказ о погоде, дороге, море и одной кошке',
+        )
+        frequent = Post.objects.create(author=self.author,
+                                       text='Кошка и кошки')
+        self.assertEqual(self.search('кошки'), [frequent, rare])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(author=self.author, text='Первый текст')
+        post.text = 'Исправленная запись'
+        post.save()
+        self.assertEqual(self.search('первый'), [])
+        self.assertEqual(self.search('исправленный'), [post])
+        post.delete()
+        self.assertEqual(self.search('исправленный'), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Служебные символы FTS в запросе не приводят к ошибке."""
+        Post.objects.create(author=self.author, text='Тестовый пост')
+        for query in ('"', 'NOT', 'пост OR*', '(', ''):
+            with self.subTest(query=query):
+                response = self.guest_client.get(self.url, {'q': query})
+                self.assertEqual(response.status_code, 200)
+
+    def test_pagination_keeps_query(self):
+        """Ссылки постраничного вывода сохраняют поисковый запрос."""
+        for i in range(settings.POSTS_ON_PAGE + 3):
+            Post.objects.create(author=self.author, text=f'Пост номер {i}')
+        self.assertEqual(len(self.search('пост', page=2)), 3)
+        response = self.guest_client.get(self.url, {'q': 'пост'})
+        self.assertContains(
+            response, 'href="?q=%D0%BF%D0%BE%D1%81%D1%82&amp;page=2"'
+        )
+
+    def test_rebuild_restores_index(self):
+        """Пересборка индекса находит посты, добавленные без сигналов."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Загруженная запись'),
+        ])
+        self.assertEqual(self.search('загрузить'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(len(self.search('загруженные')), 1)
+
+
+class TestQueryPlans(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(author=self.author, text='Пост',
+                                        group=self.group)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Комментарий')
+        cache.clear()
+
+    def query_plans(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url, params)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans[query['sql']] = ' '.join(
+                    row[-1] for row in cursor.fetchall()
+                )
+        return plans
+
+    def test_feeds_are_read_in_index_order(self):
+        """Ленты и комментарии читаются по индексу, без сортировки во
+        временном B-дереве."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for mode in ('offset', 'keyset'):
+            for url in urls:
+                with self.settings(PAGINATION_MODE=mode):
+                    cache.clear()
+                    for sql, plan in self.query_plans(url).items():
+                        with self.subTest(mode=mode, url=url, sql=sql):
+                            self.assertNotIn('TEMP B-TREE', plan)
+                            if 'ORDER BY' in sql:
+                                self.assertIn('USING INDEX', plan)
+
+
+@override_settings(COMMENTS_ON_PAGE=3)
+class TestCommentsPagination(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+        self.author = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        self.comments = [
+            Comment.objects.create(post=self.post, author=self.author,
+                                   text=f'Комментарий {i}')
+            for i in range(7)
+        ]
+        self.fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.id}
+        )
+
+    def test_comments_are_loaded_in_chunks(self):
+        """Комментарии выводятся порциями, следующая порция
+        подгружается по курсору."""
+        response = self.guest_client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        ))
+        page = response.context['comments']
+        loaded = list(page)
+        while page.has_next():
+            response = self.guest_client.get(
+                self.fragment_url, {'cursor': page.next_cursor}
+            )
+            page = response.context['comments']
+            loaded += list(page)
+        self.assertEqual(loaded, self.comments)
+
+    def test_fragment_loads_authors_with_comments(self):
+        """Фрагмент загружает авторов вместе с комментариями
+        и не содержит разметки всей страницы."""
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(self.fragment_url)
+        self.assertNotContains(response, '<html')
+        self.assertContains(response, self.author.username)
+        self.assertContains(response, 'data-fragment=')
+
+    def test_stale_cursor_does_not_restart_comments(self):
+        """Курсор за последним комментарием дает пустую порцию,
+        а неразборчивый курсор - 404."""
+        paginator = KeysetPaginator(
+            self.post.comments.all(), 3, ordering=('pub_date', 'id')
+        )
+        stale = paginator.encode_cursor(NEXT, self.comments[-1])
+        Comment.objects.filter(pk=self.comments[-1].pk).delete()
+        response = self.guest_client.get(
+            self.fragment_url, {'cursor': stale}
+        )
+        page = response.context['comments']
+        self.assertEqual(list(page), [])
+        self.assertFalse(page.has_next())
+        response = self.guest_client.get(
+            self.fragment_url, {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class TestConditionalGet(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='auth')
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.guest_client = Client()
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(author=self.author, text='Пост',
+                                        group=self.group)
+        cache.clear()
+
+    def test_unchanged_pages_are_not_rendered(self):
+        """Неизменившаяся страница отдается как 304 без шаблона."""
+        urls = (
+            reverse('posts:main_page'),
+            reverse('posts:group_list', kwargs={'any_slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.author_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    @override_settings(SCOPE_VERSION_TIMEOUT=60)
+    def test_versions_expire_in_local_cache(self):
+        """Версии областей в кэше процесса устаревают, и ETag
+        меняется даже без правок, замеченных этим процессом."""
+        url = reverse('posts:main_page')
+        etag = self.guest_client.get(url)['ETag']
+        later = time.time() + 61
+        with mock.patch('time.time', return_value=later):
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_changes_produce_new_etag(self):
+        """Новый пост или комментарий меняют ETag страниц."""
+        index_url = reverse('posts:main_page')
+        post_url = reverse('posts:post_detail',
+                           kwargs={'post_id': self.post.id})
+        index_etag = self.guest_client.get(index_url)['ETag']
+        post_etag = self.guest_client.get(post_url)['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Комментарий')
+        response = self.guest_client.get(
+            index_url, HTTP_IF_NONE_MATCH=index_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.guest_client.get(
+            post_url, HTTP_IF_NONE_MATCH=post_etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Разные пользователи получают разные ETag одной страницы."""
+        url = reverse('posts:main_page')
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'],
+            self.author_client.get(url)['ETag'],
+        )
+
+
+class TestRecommendations(TestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        users = {
+            name: User.objects.create_user(username=name)
+            for name in ('followed', 'popular', 'other', 'grouped')
+        }
+        self.users = users
+        Follow.objects.create(user=self.reader, author=users['followed'])
+        Follow.objects.create(user=users['followed'], author=users['popular'])
+        Follow.objects.create(user=users['followed'], author=users['other'])
+        Follow.objects.create(user=users['other'], author=users['popular'])
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(author=self.reader, text='Пост', group=group)
+        Post.objects.create(author=users['grouped'], text='Пост', group=group)
+        cache.clear()
+
+    def suggested(self, url):
+        response = self.reader_client.get(url)
+        return [
+            suggestion.author.username
+            for suggestion in response.context['suggestions']
+        ]
+
+    def test_follow_graph_and_groups(self):
+        """Рекомендуются подписки подписок и авторы общих групп,
+        но не сам читатель и не те, на кого он уже подписан."""
+        rows = recommendations.build()
+        self.assertEqual(
+            self.suggested(reverse('posts:follow_index')),
+            ['popular', 'other', 'grouped'],
+        )
+        self.assertEqual(rows, Recommendation.objects.count())
+
+    def test_shown_on_profile_and_updated_on_follow(self):
+        """Рекомендации видны в профиле, подписка убирает автора."""
+        recommendations.build()
+        url = reverse('posts:profile', args=[self.users['followed']])
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Кого читать')
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.users['other']])
+        )
+        self.assertEqual(self.suggested(url), ['popular', 'grouped'])
+        with self.assertNumQueries(1):
+            list(recommendations.for_user(self.reader))
+
+    def test_users_created_during_build_are_skipped(self):
+        """Подписки и посты пользователя, появившегося после чтения
+        списка пользователей, не ломают пересчет."""
+        users = array('q', User.objects.order_by('pk').values_list(
+            'pk', flat=True
+        ))
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=newcomer, author=self.reader)
+        Follow.objects.create(user=self.reader, author=newcomer)
+        Post.objects.create(
+            author=newcomer, text='Пост', group=Group.objects.get()
+        )
+        follows, groups = recommendations.load(users)
+        self.assertEqual(len(follows.indices), Follow.objects.count() - 2)
+        self.assertEqual(len(groups.indices), 2)
+
+
+class TestTrending(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.quiet = Post.objects.create(author=self.user, text='Тихий')
+        self.busy = Post.objects.create(author=self.user, text='Обсуждаемый')
+        for post in (self.busy, self.busy, self.quiet):
+            Comment.objects.create(author=self.user, text='Текст', post=post)
+        cache.clear()
+
+    def test_trending_page(self):
+        """Вкладка «Популярное» показывает посты по оценке и берет
+        список из кэша до следующего затухания."""
+        url = reverse('posts:trending')
+        response = self.client.get(url)
+        self.assertContains(response, f'href="{url}"')
+        self.assertEqual(response.context['posts'], [self.busy, self.quiet])
+        for _ in range(2):
+            Comment.objects.create(
+                author=self.user, text='Текст', post=self.quiet
+            )
+        # Сессия, пользователь и посты по id из кэша
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context['posts'], [self.busy, self.quiet])
+        call_command('decay_trending', stdout=StringIO())
+        response = self.client.get(url)
+        self.assertEqual(response.context['posts'], [self.quiet, self.busy])
@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics, tasks
+
+from . import caching
+from .models import Post
+
+# Те же параметры, что у {% thumbnail %} в шаблонах постов
+POST_GEOMETRY = '960x339'
+POST_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Отдает только готовые миниатюры.
+
+    Пока миниатюра не готова, get_thumbnail возвращает None и тег
+    {% thumbnail %} выводит блок {% empty %}. Задачи на создание ставят
+    сохранение поста и warm_thumbnails, но не отрисовка шаблона: иначе
+    каждый просмотр писал бы в очередь и уводил читателя с реплики.
+    """
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        with metrics.timed('thumbnail'):
+            if not settings.THUMBNAIL_DEFERRED:
+                return super().get_thumbnail(
+                    file_, geometry_string, **options
+                )
+            return self.get_cached(file_, geometry_string, **options)
+
+    def get_cached(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def generate(self, file_, geometry_string, **options):
+        if self.get_cached(file_, geometry_string, **options) is not None:
+            return False
+        super().get_thumbnail(file_, geometry_string, **options)
+        return True
+
+
+def schedule(file_, geometry_string=POST_GEOMETRY, **options):
+    options = options or POST_OPTIONS
+    name = str(file_)
+    tasks.enqueue(
+        generate_thumbnail,
+        [name, geometry_string, sorted(options.items())],
+        key=f'thumbnail:{name}:{geometry_string}',
+    )
+
+
+@tasks.task()
+def generate_thumbnail(name, geometry_string, options):
+    if generate(name, geometry_string, **dict(options)):
+        refresh_posts(name)
+
+
+def generate(name, geometry_string=POST_GEOMETRY, **options):
+    options = options or POST_OPTIONS
+    return DeferredThumbnailBackend().generate(
+        name, geometry_string, **options
+    )
+
+
+def refresh_posts(name):
+    # Карточки постов кэшируются по времени изменения, поэтому его
+    # сдвиг заменяет заглушку на готовую миниатюру.
+    posts = Post.objects.filter(image=name)
+    posts.update(updated=timezone.now())
+    for post in posts:
+        caching.invalidate(*caching.post_scopes(post))
@@ -0,0 +1,51 @@
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def fan_out(post):
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator(chunk_size=BATCH_SIZE)],
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild():
+    # Одним INSERT ... SELECT, без выборки постов в Python
+    TimelineEntry.objects.all().delete()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(TimelineEntry._meta.db_table)} '
+            '(user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {quote(Follow._meta.db_table)} follow '
+            f'JOIN {quote(Post._meta.db_table)} post '
+            'ON post.author_id = follow.author_id '
+            'WHERE follow.user_id IS NOT NULL'
+        )
+    return TimelineEntry.objects.count()
@@ -0,0 +1,142 @@
+"""Популярные посты: скорость комментирования с затуханием.
+
+Вес комментария убывает вдвое за TRENDING_HALF_LIFE. Чтобы не
+пересчитывать все строки на каждый комментарий, оценки хранятся
+приведенными к общему моменту epoch, а новый комментарий добавляет вес
+2 ** (возраст epoch / полупериод). Порядок строк при этом тот же, что и
+у затухающих оценок. Периодический decay переносит epoch на текущий
+момент, чтобы веса не росли, и удаляет остывшие посты. Если decay
+давно не запускался, record_comment переносит epoch сам.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import caching
+from .models import Comment, Post, TrendingScore
+
+TOP_KEY = caching.PAGE_KEY.format(caching.TRENDING_SCOPE, 'top')
+# Через столько полупериодов от epoch новый комментарий переносит
+# epoch сам: вес 2 ** 32 еще складывается со старыми оценками без
+# заметной потери точности
+REBASE_AFTER = 32
+# 2 ** 1024 уже не помещается во float
+MAX_EXPONENT = 1000.0
+
+
+def _weight(moment, epoch):
+    seconds = (moment - epoch).total_seconds()
+    # Оценка, деленная на вес очень старого epoch, все равно нулевая
+    return 2 ** min(seconds / settings.TRENDING_HALF_LIFE, MAX_EXPONENT)
+
+
+def current_epoch():
+    # Строка с наибольшей оценкой находится по индексу
+    epoch = TrendingScore.objects.order_by('-score').values_list(
+        'epoch', flat=True
+    ).first()
+    return epoch or timezone.now()
+
+
+def _rebase(now):
+    epochs = TrendingScore.objects.order_by().values_list(
+        'epoch', flat=True
+    ).distinct()
+    for epoch in list(epochs):
+        TrendingScore.objects.filter(epoch=epoch).update(
+            score=F('score') / _weight(now, epoch), epoch=now
+        )
+
+
+def record_comment(comment):
+    epoch = current_epoch()
+    age = (comment.pub_date - epoch).total_seconds()
+    if age > REBASE_AFTER * settings.TRENDING_HALF_LIFE:
+        with transaction.atomic():
+            _rebase(comment.pub_date)
+        epoch = comment.pub_date
+    TrendingScore.objects.bulk_create(
+        [TrendingScore(post_id=comment.post_id, epoch=epoch)],
+        ignore_conflicts=True,
+    )
+    TrendingScore.objects.filter(post_id=comment.post_id).update(
+        score=F('score') + _weight(comment.pub_date, epoch)
+    )
+
+
+def forget_comment(comment):
+    """Снимает с поста вес удаленного комментария; строку поста без
+    других свежих комментариев удаляет. Строка удаленного поста уходит
+    вместе с ним."""
+    epoch = TrendingScore.objects.filter(
+        post_id=comment.post_id
+    ).values_list('epoch', flat=True).first()
+    if epoch is None:
+        return
+    row = TrendingScore.objects.filter(post_id=comment.post_id, epoch=epoch)
+    row.update(score=F('score') - _weight(comment.pub_date, epoch))
+    row.filter(
+        score__lt=settings.TRENDING_MIN_SCORE * _weight(timezone.now(), epoch)
+    ).delete()
+
+
+@transaction.atomic
+def decay():
+    """Приводит оценки к текущему моменту и возвращает число
+    удаленных остывших постов."""
+    _rebase(timezone.now())
+    deleted, _ = TrendingScore.objects.filter(
+        score__lt=settings.TRENDING_MIN_SCORE
+    ).delete()
+    caching.invalidate(caching.TRENDING_SCOPE)
+    return deleted
+
+
+@transaction.atomic
+def rebuild():
+    """Заново считает оценки по комментариям, которые еще не остыли."""
+    now = timezone.now()
+    horizon = settings.TRENDING_HALF_LIFE * math.log2(
+        1 / settings.TRENDING_MIN_SCORE
+    )
+    scores = defaultdict(float)
+    comments = Comment.objects.filter(
+        post__isnull=False,
+        pub_date__gte=now - timedelta(seconds=horizon),
+    ).order_by().values_list('post_id', 'pub_date')
+    for post_id, pub_date in comments.iterator():
+        scores[post_id] += _weight(pub_date, now)
+    TrendingScore.objects.all().delete()
+    rows = TrendingScore.objects.bulk_create([
+        TrendingScore(post_id=post_id, score=score, epoch=now)
+        for post_id, score in scores.items()
+        if score >= settings.TRENDING_MIN_SCORE
+    ])
+    caching.invalidate(caching.TRENDING_SCOPE)
+    return len(rows)
+
+
+def top_ids():
+    return list(
+        TrendingScore.objects.order_by('-score').values_list(
+            'post_id', flat=True
+        )[:settings.TRENDING_COUNT]
+    )
+
+
+def top_posts():
+    """Самые популярные посты; в кэше хранится только список id,
+    поэтому правки и удаления постов видны сразу."""
+    ids = caching.get_or_compute(
+        TOP_KEY,
+        caching.scope_version(caching.TRENDING_SCOPE),
+        top_ids,
+        settings.TRENDING_CACHE_TIMEOUT,
+    )
+    posts = Post.objects.feed().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
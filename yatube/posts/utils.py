@@ -1,10 +1,125 @@
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
-from yatube.settings import POSTS_ON_PAGE
+NEXT = 'n'
+PREVIOUS = 'p'
 
 
-def CastomPaginator(request, posts):
-    paginator = Paginator(posts, POSTS_ON_PAGE)
+def CastomPaginator(request, posts, per_page=None):
+    per_page = per_page or settings.POSTS_ON_PAGE
+    keyset = settings.PAGINATION_MODE == 'keyset' or 'cursor' in request.GET
+    if keyset and isinstance(posts, QuerySet):
+        paginator = KeysetPaginator(posts, per_page)
+        try:
+            return paginator.get_page(request.GET.get('cursor'))
+        except InvalidPage as exc:
+            raise Http404(str(exc))
+    paginator = Paginator(posts, per_page)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+class KeysetPage(Page):
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Keyset page of %s>' % len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator(Paginator):
+    """Постраничный вывод по ключу (pub_date, id) без COUNT и OFFSET.
+
+    Каждая страница - это поиск по индексу от последней записи
+    предыдущей страницы, поэтому время ответа не зависит от глубины.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+
+    def get_page(self, cursor=None):
+        """Страница после курсора. Для неразборчивого курсора бросает
+        InvalidPage, а курсор, за которым записей уже нет, дает пустую
+        страницу: иначе "показать еще" повторил бы первую страницу."""
+        direction, key = self.decode_cursor(cursor)
+        backwards = direction == PREVIOUS
+        posts = self.object_list
+        if key is not None:
+            posts = posts.filter(self._seek(key, backwards))
+        if backwards:
+            posts = posts.reverse()
+        rows = list(posts[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows:
+            return KeysetPage([], self, None, None)
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, key is not None
+        return KeysetPage(
+            rows,
+            self,
+            self.encode_cursor(NEXT, rows[-1]) if has_next else None,
+            self.encode_cursor(PREVIOUS, rows[0]) if has_previous else None,
+        )
+
+    def _seek(self, key, backwards):
+        (first, second), (first_value, second_value) = self.ordering, key
+        first_lookup = self._lookup(first, backwards)
+        second_lookup = self._lookup(second, backwards)
+        return Q(**{first_lookup: first_value}) | Q(
+            **{first.lstrip('-'): first_value, second_lookup: second_value}
+        )
+
+    @staticmethod
+    def _lookup(field, backwards):
+        descending = field.startswith('-')
+        operator = 'lt' if descending != backwards else 'gt'
+        return '{}__{}'.format(field.lstrip('-'), operator)
+
+    def encode_cursor(self, direction, obj):
+        first, second = (field.lstrip('-') for field in self.ordering)
+        # Строки из .values() приходят словарями
+        if isinstance(obj, dict):
+            first_value, second_value = obj[first], obj[second]
+        else:
+            first_value = getattr(obj, first)
+            second_value = getattr(obj, second)
+        raw = '{}|{}|{}'.format(
+            direction, first_value.isoformat(), second_value
+        )
+        return urlsafe_base64_encode(raw.encode())
+
+    @staticmethod
+    def decode_cursor(cursor):
+        if not cursor:
+            return NEXT, None
+        try:
+            direction, value, pk = force_str(
+                urlsafe_base64_decode(cursor)
+            ).split('|')
+            key = (parse_datetime(value), int(pk))
+        except ValueError:
+            raise InvalidPage('Неверный курсор')
+        if direction not in (NEXT, PREVIOUS) or key[0] is None:
+            raise InvalidPage('Неверный курсор')
+        return direction, key
@@ -1,34 +1,123 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import Http404
+from django.utils.http import urlencode
+
+from core.routers import read_replica
 
 from .models import Post, Group, Follow, User
 from .forms import PostForm, CommentForm
-from .utils import CastomPaginator
+from . import caching, recommendations, trending
+from .counters import get_stats
+from .fulltext import SearchResults
+from .utils import CastomPaginator, KeysetPaginator
+
+
+def index_scopes(request):
+    return [caching.INDEX_SCOPE]
+
+
+def recommendation_scopes(request):
+    if not request.user.is_authenticated:
+        return []
+    return [
+        caching.RECOMMENDATIONS_SCOPE,
+        caching.recommendations_scope(request.user.pk),
+    ]
+
+
+def follow_scopes(request):
+    return [
+        caching.follow_scope(request.user.pk),
+        *recommendation_scopes(request),
+    ]
+
+
+def group_scopes(request, any_slug):
+    groups = Group.objects.filter(slug=any_slug).values_list(
+        'pk', flat=True
+    )
+    return [caching.group_scope(pk) for pk in groups]
+
 
+def profile_scopes(request, username):
+    authors = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True)
+    if not authors:
+        return []
+    return [
+        *(caching.profile_scope(pk) for pk in authors),
+        *recommendation_scopes(request),
+    ]
 
-@cache_page(20, key_prefix='index_page')
+
+def post_scopes(request, post_id):
+    # На странице поста есть и счетчик постов автора
+    authors = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author_id', flat=True
+    )
+    return [
+        scope
+        for author_id in authors
+        for scope in (caching.post_scope(post_id),
+                      caching.profile_scope(author_id))
+    ]
+
+
+@read_replica
+@caching.conditional(index_scopes)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_obj = CastomPaginator(request, posts)
+    posts = Post.objects.feed()
+    page_obj = caching.feed_page(request, caching.INDEX_SCOPE, posts)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@read_replica
 @login_required
+@caching.conditional(follow_scopes)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = CastomPaginator(request, posts)
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = caching.feed_page(
+        request, caching.follow_scope(request.user.pk), entries
+    )
     context = {
         'page_obj': page_obj,
+        'suggestions': recommendations.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
 
+@read_replica
+def trending_posts(request):
+    context = {
+        'posts': trending.top_posts(),
+    }
+    return render(request, 'posts/trending.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = CastomPaginator(request, SearchResults(query))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     follow = Follow.objects.filter(user=request.user, author=author)
@@ -38,6 +127,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     following = Follow.objects.filter(user_id=request.user, author=author)
@@ -46,11 +136,15 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@read_replica
+@caching.conditional(group_scopes)
 def group_posts(request, any_slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=any_slug)
-    posts = group.posts.all()
-    page_obj = CastomPaginator(request, posts)
+    posts = group.posts.feed()
+    page_obj = caching.feed_page(
+        request, caching.group_scope(group.pk), posts
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -60,10 +154,16 @@ def group_posts(request, any_slug):
 # Все, теперь вроде разобрался, спасибо!
 
 
+@read_replica
+@caching.conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = CastomPaginator(request, posts)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.feed()
+    page_obj = caching.feed_page(
+        request, caching.profile_scope(author.pk), posts
+    )
     follower = request.user.is_authenticated and Follow.objects.filter(
         user_id=request.user, author=author).exists()
     if follower and request.user != author:
@@ -72,13 +172,16 @@ def profile(request, username):
         following = False
     context = {
         'author': author,
+        'stats': get_stats(author),
         'page_obj': page_obj,
         'following': following,
+        'suggestions': recommendations.for_user(request.user),
     }
     return render(request, 'posts/profile.html', context)
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -90,19 +193,47 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@read_replica
+@caching.conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__stats'), id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
+        'author_stats': get_stats(post.author),
         'form': form,
-        'comments': comments,
+        'comments': comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@read_replica
+@caching.conditional(post_scopes)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post, id=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(request, post),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
+def comments_page(request, post):
+    paginator = KeysetPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_ON_PAGE,
+        ordering=('pub_date', 'id'),
+    )
+    try:
+        return paginator.get_page(request.GET.get('cursor'))
+    except InvalidPage as exc:
+        raise Http404(str(exc))
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
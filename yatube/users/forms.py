@@ -1,5 +1,8 @@
-from django.contrib.auth.forms import UserCreationForm
+from django.contrib.auth.forms import PasswordResetForm, UserCreationForm
 from django.contrib.auth import get_user_model
+from django.template.loader import render_to_string
+
+from core import tasks
 
 User = get_user_model()
 
@@ -8,3 +11,22 @@ class CreationForm(UserCreationForm):
     class Meta(UserCreationForm.Meta):
         model = User
         fields = ('first_name', 'last_name', 'username', 'email')
+
+
+class QueuedPasswordResetForm(PasswordResetForm):
+    """Письмо со ссылкой для сброса отправляется фоновой задачей."""
+
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email,
+                  html_email_template_name=None):
+        subject = ''.join(
+            render_to_string(subject_template_name, context).splitlines()
+        )
+        body = render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = render_to_string(html_email_template_name, context)
+        tasks.enqueue(
+            tasks.send_email,
+            [subject, body, from_email, [to_email], html_body],
+        )
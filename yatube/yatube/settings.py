@@ -48,10 +48,14 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,7 +70,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templating.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,12 +90,54 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль SQLite выбирается переменной YATUBE_SQLITE_PROFILE.
+# В production журнал WAL не дает записи блокировать чтение,
+# транзакции сразу берут блокировку записи и ждут ее до timeout
+# секунд, а соединения переиспользуются между запросами.
+# synchronous=NORMAL в WAL не теряет данные при падении процесса,
+# только последние транзакции при отключении питания.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'cache_size': -64000,
+                'temp_store': 'MEMORY',
+                'mmap_size': 256 * 1024 * 1024,
+            },
+        },
+    },
+}
+SQLITE_PROFILE = os.getenv('YATUBE_SQLITE_PROFILE', 'default')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.getenv(
+            'YATUBE_DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')
+        ),
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+    },
+    # Локально реплику заменяет копия db.sqlite3 (manage.py sync_replica)
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.getenv(
+            'YATUBE_REPLICA_NAME', os.path.join(BASE_DIR, 'replica.sqlite3')
+        ),
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+    },
 }
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Базы, с которых читают ленты и страницы постов; пусто - только default
+REPLICA_DATABASES = ['replica'] if os.getenv('YATUBE_REPLICA_NAME') else []
+# Сколько секунд после записи пользователь читает с primary
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_pin'
 
 
 # Password validation
@@ -112,11 +158,46 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Кэш выбирается переменной окружения YATUBE_CACHE: locmem - свой
+# у каждого процесса, sqlite - общий файл для всех воркеров. В профиле
+# production по умолчанию общий: версии областей и ETag должны
+# меняться сразу во всех процессах.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'core.cache.LocMemCache',
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+CACHE = os.getenv(
+    'YATUBE_CACHE', 'sqlite' if SQLITE_PROFILE == 'production' else 'locmem'
+)
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_BACKENDS[CACHE],
 }
+# Страницы лент сбрасываются сигналами, поэтому в общем кэше могут жить
+# долго. В locmem другие процессы не видят сброса, там записи живут
+# не дольше минуты.
+FEED_CACHE_TIMEOUT = 60 * 60 if CACHE != 'locmem' else 60
+# Сколько еще отдавать устаревшую запись, пока ее пересчитывает
+# другой запрос, и на сколько берется блокировка пересчета
+FEED_CACHE_STALE_TIMEOUT = FEED_CACHE_TIMEOUT
+FEED_CACHE_LOCK_TIMEOUT = 10
+# Сколько секунд ждать чужого пересчета записи, сброшенной правкой
+FEED_CACHE_LOCK_WAIT = 1
+# Версии областей кэша, а с ними и ETag. В общем кэше живут до сброса;
+# в locmem процесс, не видевший правки, иначе отдавал бы 304 на
+# устаревшую страницу бесконечно.
+SCOPE_VERSION_TIMEOUT = None if CACHE != 'locmem' else FEED_CACHE_TIMEOUT
+# Коэффициент досрочного пересчета (XFetch), 0 - отключить
+FEED_CACHE_BETA = 1.0
 
 
 # Internationalization
@@ -135,15 +216,74 @@ USE_TZ = True
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:main_page'
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+# 'offset' - номера страниц, 'keyset' - курсоры по (pub_date, id)
+PAGINATION_MODE = 'offset'
+
+SEARCH_MAX_RESULTS = 1000
+
+# Сколько рекомендаций «Кого читать» хранится и показывается
+RECOMMENDATIONS_COUNT = 20
+RECOMMENDATIONS_ON_PAGE = 5
+
+# Популярные посты: вес комментария убывает вдвое за полупериод, с.
+# Оценки затухают командой decay_trending, ее стоит запускать по cron.
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_MIN_SCORE = 0.05
+TRENDING_COUNT = 20
+TRENDING_CACHE_TIMEOUT = 60
+
+API_MAX_PAGE_SIZE = 100
+API_EXPORT_CHUNK_SIZE = 2000
+
+# Замеры запросов: заголовок Server-Timing и сводка /core/performance/
+PERFORMANCE_METRICS = os.getenv('YATUBE_PERFORMANCE_METRICS') == '1'
+# Запросы к БД дольше порога (мс) пишутся в лог с планом выполнения,
+# None - журнал выключен. Повторы одного вида запроса от
+# SLOW_QUERY_REPEATS раз за HTTP-запрос отмечаются как N+1.
+SLOW_QUERY_THRESHOLD = (
+    float(os.environ['YATUBE_SLOW_QUERY_MS'])
+    if 'YATUBE_SLOW_QUERY_MS' in os.environ else None
+)
+SLOW_QUERY_REPEATS = 5
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загруженные картинки перекодируются в JPEG не больше
+# POST_IMAGE_MAX_SIDE по большей стороне и без EXIF
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'posts.images.LimitedUploadHandler',
+]
+POST_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_QUALITY = 85
+
+# Миниатюры создаются фоновой задачей, до готовности в шаблонах
+# выводится заглушка
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_DEFERRED = True
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Фоновые задачи хранятся в БД. Если run_worker не запущен
+# (YATUBE_TASK_WORKER не задан), задачи запроса выполняет тот же
+# процесс после отправки ответа, но повторы после ошибок - только воркер.
+TASK_WORKER = os.getenv('YATUBE_TASK_WORKER') == '1'
+TASK_MAX_ATTEMPTS = 5
+# Пауза перед первым повтором, с; дальше удваивается
+TASK_RETRY_DELAY = 30
+# Через сколько секунд задача упавшего воркера возвращается в очередь
+TASK_LOCK_TIMEOUT = 10 * 60
+# Сколько секунд проваленная задача не дает поставить новую с тем же
+# ключом, чтобы заведомо сломанная работа не повторялась без конца
+TASK_FAILED_COOLDOWN = 24 * 60 * 60
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 